@@ -1,6 +1,18 @@
 import pygame
 import sys
+import atexit
 import random
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+from chess_engine import (Position, move_to_tuple, COLOR_NAMES, zobrist_key, update_zobrist_key,
+                          move_to_text, evaluate_moves, LegalMoveCache)
+# WHITE and BLACK are drawing colors in this file; these are the engine's sides
+from chess_engine import WHITE as WHITE_SIDE, BLACK as BLACK_SIDE
+from chess_search import (TranspositionTable, PawnHashTable, Searcher, ParallelSearcher, LazySMPSearcher,
+                          Ponderer, parallel_search_available)
+from chess_book import OpeningBook
+from chess_tablebase import Tablebase
 
 # Detect if running on Pydroid3
 is_pydroid3 = False
@@ -137,15 +149,72 @@ board = [
     ['wR', 'wN', 'wB', 'wQ', 'wK', 'wB', 'wN', 'wR']
 ]
 
-# Piece values for AI
-piece_values = {
-    'P': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 0,
-    'p': 1, 'n': 3, 'b': 3, 'r': 5, 'q': 9, 'k': 0
-}
+# Transposition table for the hard AI - strict memory cap, smaller on phones.
+# Only one table is allocated; which one depends on PARALLEL_SEARCH below
+TT_SIZE_MB = 16 if is_pydroid3 else 64
+
+# Wall-clock budget per difficulty (seconds). The search deepens until the
+# budget runs out, so faster devices search deeper in the same time.
+SEARCH_TIME_LIMITS = {'hard': 0.5}
+
+# Opening book (book.bin next to this file), mapped on first use
+opening_book = OpeningBook()
+BOOK_DIFFICULTIES = ('medium', 'hard')
+
+# Endgame tablebases (tablebases/ next to this file) for exact play with few pieces
+tablebase = Tablebase()
+# Set CHESS_STATS_LOG to a file path to log every search's stats as JSON lines.
+# One pawn hash table serves every search, since pawn structures carry over
+# from move to move
+SEARCH_OPTIONS = {'tablebase': tablebase if tablebase.available else None,
+                  'stats_log': os.environ.get('CHESS_STATS_LOG'),
+                  'pawn_table': PawnHashTable()}
+
+# Desktop installs use every core for the hard AI: 'lazy_smp' (whole searches
+# sharing one table), 'root_split' (root moves split between processes) or
+# None for a single process
+PARALLEL_SEARCH = None if is_pydroid3 or not parallel_search_available() else 'lazy_smp'
+# The hard AI's table and searcher are created by its first search, so games
+# at easy or medium never allocate them or start worker processes
+transposition_table = None
+parallel_searcher = None
+
+# Keep searching the expected reply on a background thread while the player
+# thinks; not on phones, where it would hold a slow CPU for up to 30 s a move
+PONDERING = not is_pydroid3
+ponderer = Ponderer(None, **SEARCH_OPTIONS)
+
+def create_hard_searcher():
+    """Allocate the hard AI's table, and its worker processes, on first use"""
+    global transposition_table, parallel_searcher
+    if transposition_table is not None:
+        return
+    if PARALLEL_SEARCH == 'lazy_smp':
+        # Lazy SMP allocates its table in shared memory for the helpers
+        parallel_searcher = LazySMPSearcher(TT_SIZE_MB, **SEARCH_OPTIONS)
+        transposition_table = parallel_searcher.tt
+    elif PARALLEL_SEARCH == 'root_split':
+        transposition_table = TranspositionTable(TT_SIZE_MB)
+        parallel_searcher = ParallelSearcher(transposition_table, **SEARCH_OPTIONS)
+    else:
+        transposition_table = TranspositionTable(TT_SIZE_MB)
+    if parallel_searcher is not None:
+        # Stop the workers and free the shared table however the program exits
+        atexit.register(parallel_searcher.close)
+    ponderer.tt = transposition_table
+
+# The AI thinks on a worker thread so the event loop keeps drawing; ai_future
+# is the pending move while it does, and ai_stop cancels the search
+ai_executor = ThreadPoolExecutor(max_workers=1)
+ai_future = None
+ai_stop = threading.Event()
 
 # Game state
 selected_square = None
 turn = 'w'  # w for white, b for black
+board_key = zobrist_key(board, turn)  # Zobrist key of the current position, for caches
+# Legal moves and check status of recent positions, shared by drawing, game-end checks and the AI
+legal_move_cache = LegalMoveCache()
 game_over = False
 winner = None
 game_state = 'playing'  # 'playing', 'white_wins', 'black_wins', 'draw'
@@ -286,6 +355,12 @@ def draw_board():
     diff_y = 10
     screen.blit(diff_text, (diff_x, diff_y))
 
+def draw_thinking_indicator():
+    """Show that the AI is searching, with dots animated by the clock"""
+    dots = '.' * (1 + pygame.time.get_ticks() // 300 % 3)
+    thinking_text = small_font.render(f"Thinking{dots}", True, HIGHLIGHT_COLOR)
+    screen.blit(thinking_text, (10, 10))
+
 def draw_pieces():
     # Calculate centered board position (same as in draw_board)
     board_size = SQUARE_SIZE * 8
@@ -348,8 +423,8 @@ def draw_check_indicator():
         for col in range(8):
             piece = board[row][col]
             if piece != '--' and piece[1] == 'K':  # Found a king
-                king_color = piece[0]
-                if is_king_in_check(board, king_color):
+                king_color = COLOR_NAMES.index(piece[0])
+                if legal_move_cache.in_check(board_key, board, turn, king_color):
                     # Draw red border around the king with centered positioning
                     x = col * SQUARE_SIZE + board_x
                     y = row * SQUARE_SIZE + board_y
@@ -393,6 +468,15 @@ def draw_touch_feedback():
         # Draw border around selected piece
         pygame.draw.rect(screen, (255, 255, 0), (x, y, SQUARE_SIZE, SQUARE_SIZE), 3)
 
+def get_legal_destinations_cached(row, col):
+    """Destinations of the piece at (row, col), from the legal move cache"""
+    piece = board[row][col]
+    if piece == '--':
+        return []
+    from_sq = row * 8 + col
+    moves = legal_move_cache.legal_moves(board_key, board, turn, COLOR_NAMES.index(piece[0]))
+    return [divmod(move >> 6, 8) for move in moves if move & 63 == from_sq]
+
 def get_valid_moves_for_piece(row, col):
     """Get all valid moves for the piece at the given position"""
     valid_moves = []
@@ -401,13 +485,11 @@ def get_valid_moves_for_piece(row, col):
     if board[row][col] == '--':
         return valid_moves, valid_captures
 
-    for end_row in range(8):
-        for end_col in range(8):
-            if is_valid_move(row, col, end_row, end_col):
-                if board[end_row][end_col] == '--':
-                    valid_moves.append((end_row, end_col))
-                else:
-                    valid_captures.append((end_row, end_col))
+    for end_row, end_col in get_legal_destinations_cached(row, col):
+        if board[end_row][end_col] == '--':
+            valid_moves.append((end_row, end_col))
+        else:
+            valid_captures.append((end_row, end_col))
 
     return valid_moves, valid_captures
 
@@ -476,381 +558,83 @@ def get_square_from_pos(pos):
     return row, col
 
 def is_valid_move(start_row, start_col, end_row, end_col):
-    if start_row == end_row and start_col == end_col:
-        return False
-
-    piece = board[start_row][start_col]
-    if piece == '--':
-        return False
-
-    target_piece = board[end_row][end_col]
-    if target_piece != '--' and target_piece[0] == piece[0]:  # Same color
-        return False
-
-    piece_type = piece[1]
-    color = piece[0]
-
-    # Basic movement validation
-    move_valid = False
-
-    # Pawn movement
-    if piece_type == 'P':
-        direction = -1 if color == 'w' else 1
-        if start_col == end_col:  # Forward move
-            if target_piece == '--':  # Must be empty
-                if end_row == start_row + direction:
-                    move_valid = True
-                elif end_row == start_row + 2 * direction and start_row == (6 if color == 'w' else 1):
-                    # Check if path is clear for double move
-                    move_valid = board[start_row + direction][start_col] == '--'
-        elif abs(start_col - end_col) == 1 and end_row == start_row + direction:
-            # Diagonal capture
-            move_valid = target_piece != '--' and target_piece[0] != color
-
-    # Rook movement
-    elif piece_type == 'R':
-        if start_row == end_row:  # Horizontal move
-            step = 1 if end_col > start_col else -1
-            path_clear = True
-            for col in range(start_col + step, end_col, step):
-                if board[start_row][col] != '--':
-                    path_clear = False
-                    break
-            move_valid = path_clear
-        elif start_col == end_col:  # Vertical move
-            step = 1 if end_row > start_row else -1
-            path_clear = True
-            for row in range(start_row + step, end_row, step):
-                if board[row][start_col] != '--':
-                    path_clear = False
-                    break
-            move_valid = path_clear
-
-    # Bishop movement
-    elif piece_type == 'B':
-        if abs(start_row - end_row) == abs(start_col - end_col):
-            row_step = 1 if end_row > start_row else -1
-            col_step = 1 if end_col > start_col else -1
-            path_clear = True
-            row, col = start_row + row_step, start_col + col_step
-            while row != end_row:
-                if board[row][col] != '--':
-                    path_clear = False
-                    break
-                row += row_step
-                col += col_step
-            move_valid = path_clear
-
-    # Queen movement (combination of rook and bishop)
-    elif piece_type == 'Q':
-        # Check if it's a valid rook move
-        if start_row == end_row or start_col == end_col:
-            if start_row == end_row:  # Horizontal
-                step = 1 if end_col > start_col else -1
-                path_clear = True
-                for col in range(start_col + step, end_col, step):
-                    if board[start_row][col] != '--':
-                        path_clear = False
-                        break
-                move_valid = path_clear
-            else:  # Vertical
-                step = 1 if end_row > start_row else -1
-                path_clear = True
-                for row in range(start_row + step, end_row, step):
-                    if board[row][start_col] != '--':
-                        path_clear = False
-                        break
-                move_valid = path_clear
-        # Check if it's a valid bishop move
-        elif abs(start_row - end_row) == abs(start_col - end_col):
-            row_step = 1 if end_row > start_row else -1
-            col_step = 1 if end_col > start_col else -1
-            path_clear = True
-            row, col = start_row + row_step, start_col + col_step
-            while row != end_row:
-                if board[row][col] != '--':
-                    path_clear = False
-                    break
-                row += row_step
-                col += col_step
-            move_valid = path_clear
-
-    # Knight movement
-    elif piece_type == 'N':
-        move_valid = (abs(start_row - end_row) == 2 and abs(start_col - end_col) == 1) or \
-                     (abs(start_row - end_row) == 1 and abs(start_col - end_col) == 2)
-
-    # King movement
-    elif piece_type == 'K':
-        move_valid = abs(start_row - end_row) <= 1 and abs(start_col - end_col) <= 1
-
-    # If basic move is not valid, return False
-    if not move_valid:
+    if board[start_row][start_col] == '--':
         return False
-
-    # Now check if this move would leave the king in check
-    # Create a temporary board to simulate the move
-    temp_board = [row[:] for row in board]
-    temp_board[end_row][end_col] = temp_board[start_row][start_col]
-    temp_board[start_row][start_col] = '--'
-
-    # Check if the king would be in check after this move
-    if is_king_in_check(temp_board, color):
-        return False
-
-    return True
+    return (end_row, end_col) in get_legal_destinations_cached(start_row, start_col)
 
 def make_move(start_row, start_col, end_row, end_col):
-    global turn
+    global turn, board_key
+    board_key = update_zobrist_key(board_key, board[start_row][start_col], board[end_row][end_col],
+                                   start_row, start_col, end_row, end_col)
     board[end_row][end_col] = board[start_row][start_col]
     board[start_row][start_col] = '--'
     turn = 'b' if turn == 'w' else 'w'
     check_game_state()
 
 def get_random_move():
-    moves = []
-    for row in range(8):
-        for col in range(8):
-            if board[row][col][0] == turn:
-                for end_row in range(8):
-                    for end_col in range(8):
-                        if is_valid_move(row, col, end_row, end_col):
-                            moves.append((row, col, end_row, end_col))
+    moves = legal_move_cache.legal_moves(board_key, board, turn)
     if moves:
-        return random.choice(moves)
+        return move_to_tuple(random.choice(moves))
     return None
 
-def evaluate_board(board):
-    """Simple board evaluation for AI"""
-    score = 0
-    for row in range(8):
-        for col in range(8):
-            piece = board[row][col]
-            if piece != '--':
-                # Material value
-                value = piece_values.get(piece[1], 0)
-                # Position bonus for center control
-                center_bonus = 0
-                if 2 <= row <= 5 and 2 <= col <= 5:
-                    center_bonus = 0.1 * value
-                # Color multiplier
-                multiplier = 1 if piece[0] == 'b' else -1  # Black is maximizing, white is minimizing
-                score += multiplier * (value + center_bonus)
-    return score
-
-def minimax(board, depth, alpha, beta, maximizing_player):
-    """Minimax algorithm with alpha-beta pruning"""
-    if depth == 0 or game_over:
-        return evaluate_board(board), None
-
-    if maximizing_player:  # Black's turn (AI)
-        max_eval = float('-inf')
-        best_move = None
-        moves = get_all_moves(board, 'b')
-        for move in moves:
-            temp_board = [row[:] for row in board]
-            temp_board[move[2]][move[3]] = temp_board[move[0]][move[1]]
-            temp_board[move[0]][move[1]] = '--'
-            eval_score, _ = minimax(temp_board, depth - 1, alpha, beta, False)
-            if eval_score > max_eval:
-                max_eval = eval_score
-                best_move = move
-            alpha = max(alpha, eval_score)
-            if beta <= alpha:
-                break
-        return max_eval, best_move
-    else:  # White's turn (player)
-        min_eval = float('inf')
-        best_move = None
-        moves = get_all_moves(board, 'w')
-        for move in moves:
-            temp_board = [row[:] for row in board]
-            temp_board[move[2]][move[3]] = temp_board[move[0]][move[1]]
-            temp_board[move[0]][move[1]] = '--'
-            eval_score, _ = minimax(temp_board, depth - 1, alpha, beta, True)
-            if eval_score < min_eval:
-                min_eval = eval_score
-                best_move = move
-            beta = min(beta, eval_score)
-            if beta <= alpha:
-                break
-        return min_eval, best_move
-
-def get_all_moves(board, color):
-    """Get all valid moves for a color"""
-    moves = []
-    for row in range(8):
-        for col in range(8):
-            if board[row][col][0] == color:
-                for end_row in range(8):
-                    for end_col in range(8):
-                        if is_valid_move(row, col, end_row, end_col):
-                            moves.append((row, col, end_row, end_col))
-    return moves
-
 def get_computer_move(difficulty):
     """Get computer move based on difficulty level"""
+    position = Position.from_board(board, turn)
+    # Known opening positions are answered from the book without searching
+    book_move = opening_book.choose(position) if difficulty in BOOK_DIFFICULTIES else None
+    if difficulty != 'hard' or book_move is not None:
+        # Only a hard search can use the ponder result; stop it on every other path
+        ponderer.cancel()
+    if book_move is not None:
+        print(f"AI: book move {move_to_text(book_move)}")
+        return move_to_tuple(book_move)
+
     if difficulty == 'easy':
         # Pure random moves
         return get_random_move()
     elif difficulty == 'medium':
-        # Basic evaluation with 1-ply lookahead
-        moves = get_all_moves(board, turn)
+        # Basic evaluation with 1-ply lookahead, all children scored in one batch
+        moves = legal_move_cache.legal_moves(board_key, board, turn)
         if not moves:
             return None
 
-        best_move = None
-        best_score = float('-inf')
-
-        for move in moves:
-            temp_board = [row[:] for row in board]
-            temp_board[move[2]][move[3]] = temp_board[move[0]][move[1]]
-            temp_board[move[0]][move[1]] = '--'
-            score = evaluate_board(temp_board)
-            if score > best_score:
-                best_score = score
-                best_move = move
-
-        return best_move if best_move else random.choice(moves)
+        scores = evaluate_moves(position, moves)
+        best_score = max(scores)
+        return move_to_tuple(moves[scores.index(best_score)])
     elif difficulty == 'hard':
-        # Full minimax with alpha-beta pruning (2-ply)
-        _, best_move = minimax(board, 2, float('-inf'), float('inf'), True)
-        return best_move
+        # Iterative deepening alpha-beta within the time budget
+        create_hard_searcher()
+        pondered = ponderer.finish(position.key, SEARCH_TIME_LIMITS['hard'])
+        if pondered is not None:
+            searcher = ponderer.searcher
+            _, best_move, depth = pondered
+            print("AI: ponder hit")
+        else:
+            searcher = parallel_searcher or Searcher(transposition_table, **SEARCH_OPTIONS)
+            searcher.stop = ai_stop
+            _, best_move, depth = searcher.iterative_deepening(position, SEARCH_TIME_LIMITS['hard'])
+        stats = searcher.stats
+        print(f"AI: searched to depth {depth}, {stats.nodes} nodes ({stats.qnodes} quiescence), "
+              f"{stats.nps} nodes/s, {stats.tt_hit_rate:.0%} table hits, "
+              f"{stats.pawn_hit_rate:.0%} pawn table hits, "
+              f"{searcher.first_move_cutoff_rate():.0%} of cutoffs on the first move")
+        print(f"AI: principal variation {' '.join(move_to_text(move) for move in searcher.principal_variation)}")
+        if (PONDERING and best_move is not None and not ai_stop.is_set() and
+                len(searcher.principal_variation) >= 2):
+            ponderer.start(position, searcher.principal_variation[:2])
+        return move_to_tuple(best_move) if best_move is not None else None
     else:
         # Default to easy
         return get_random_move()
 
-def can_piece_attack_square(board, start_row, start_col, end_row, end_col):
-    """Check if a piece can attack a square (basic movement rules only, no king safety)"""
-    if start_row == end_row and start_col == end_col:
-        return False
-
-    piece = board[start_row][start_col]
-    if piece == '--':
-        return False
-
-    target_piece = board[end_row][end_col]
-    if target_piece != '--' and target_piece[0] == piece[0]:  # Same color
-        return False
-
-    piece_type = piece[1]
-
-    # Pawn attack (diagonal only)
-    if piece_type == 'P':
-        color = piece[0]
-        direction = -1 if color == 'w' else 1
-        if abs(start_col - end_col) == 1 and end_row == start_row + direction:
-            return True
-
-    # Rook movement
-    elif piece_type == 'R':
-        if start_row == end_row:  # Horizontal move
-            step = 1 if end_col > start_col else -1
-            for col in range(start_col + step, end_col, step):
-                if board[start_row][col] != '--':
-                    return False
-            return True
-        elif start_col == end_col:  # Vertical move
-            step = 1 if end_row > start_row else -1
-            for row in range(start_row + step, end_row, step):
-                if board[row][start_col] != '--':
-                    return False
-            return True
-
-    # Bishop movement
-    elif piece_type == 'B':
-        if abs(start_row - end_row) == abs(start_col - end_col):
-            row_step = 1 if end_row > start_row else -1
-            col_step = 1 if end_col > start_col else -1
-            row, col = start_row + row_step, start_col + col_step
-            while row != end_row:
-                if board[row][col] != '--':
-                    return False
-                row += row_step
-                col += col_step
-            return True
-
-    # Queen movement (combination of rook and bishop)
-    elif piece_type == 'Q':
-        # Check if it's a valid rook move
-        if start_row == end_row or start_col == end_col:
-            if start_row == end_row:  # Horizontal
-                step = 1 if end_col > start_col else -1
-                for col in range(start_col + step, end_col, step):
-                    if board[start_row][col] != '--':
-                        return False
-            else:  # Vertical
-                step = 1 if end_row > start_row else -1
-                for row in range(start_row + step, end_row, step):
-                    if board[row][start_col] != '--':
-                        return False
-            return True
-        # Check if it's a valid bishop move
-        elif abs(start_row - end_row) == abs(start_col - end_col):
-            row_step = 1 if end_row > start_row else -1
-            col_step = 1 if end_col > start_col else -1
-            row, col = start_row + row_step, start_col + col_step
-            while row != end_row:
-                if board[row][col] != '--':
-                    return False
-                row += row_step
-                col += col_step
-            return True
-
-    # Knight movement
-    elif piece_type == 'N':
-        if (abs(start_row - end_row) == 2 and abs(start_col - end_col) == 1) or \
-           (abs(start_row - end_row) == 1 and abs(start_col - end_col) == 2):
-            return True
-
-    # King movement
-    elif piece_type == 'K':
-        if abs(start_row - end_row) <= 1 and abs(start_col - end_col) <= 1:
-            return True
-
-    return False
-
-def is_king_in_check(board, king_color):
-    # Find king position
-    king_pos = None
-    for row in range(8):
-        for col in range(8):
-            if board[row][col] == king_color + 'K':
-                king_pos = (row, col)
-                break
-        if king_pos:
-            break
-
-    if not king_pos:
-        return False
-
-    # Check if any opponent piece can attack the king
-    opponent_color = 'b' if king_color == 'w' else 'w'
-    for row in range(8):
-        for col in range(8):
-            if board[row][col][0] == opponent_color:
-                if can_piece_attack_square(board, row, col, king_pos[0], king_pos[1]):
-                    return True
-    return False
-
-def has_legal_moves(board, color):
-    for row in range(8):
-        for col in range(8):
-            if board[row][col][0] == color:
-                for end_row in range(8):
-                    for end_col in range(8):
-                        if is_valid_move(row, col, end_row, end_col):
-                            return True
-    return False
-
 def check_game_state():
     global game_state, winner, game_over
 
-    white_in_check = is_king_in_check(board, 'w')
-    black_in_check = is_king_in_check(board, 'b')
+    white_in_check = legal_move_cache.in_check(board_key, board, turn, WHITE_SIDE)
+    black_in_check = legal_move_cache.in_check(board_key, board, turn, BLACK_SIDE)
 
-    white_has_moves = has_legal_moves(board, 'w')
-    black_has_moves = has_legal_moves(board, 'b')
+    white_has_moves = bool(legal_move_cache.legal_moves(board_key, board, turn, WHITE_SIDE))
+    black_has_moves = bool(legal_move_cache.legal_moves(board_key, board, turn, BLACK_SIDE))
 
     print(f"Debug: White in check: {white_in_check}, White has moves: {white_has_moves}")
     print(f"Debug: Black in check: {black_in_check}, Black has moves: {black_has_moves}")
@@ -881,9 +665,47 @@ def check_game_state():
                 winner = None
                 game_over = True
                 print("Debug: Stalemate - Draw!")
+    if game_over:
+        ponderer.cancel()  # No reply left to ponder
+
+def start_computer_move():
+    """Start the AI's search on the worker thread"""
+    global ai_future
+    if difficulty == 'hard':
+        # On this thread, so worker processes are forked before the AI thread runs
+        create_hard_searcher()
+    ai_stop.clear()
+    ai_future = ai_executor.submit(get_computer_move, difficulty)
+
+def poll_computer_move():
+    """Play the AI's move once the worker has finished; called every frame"""
+    global ai_future
+    if ai_future is None or not ai_future.done():
+        return
+    future, ai_future = ai_future, None
+    try:
+        move = future.result()
+    except Exception as e:
+        print(f"AI move error: {e}")
+        traceback.print_exc()
+        return
+    if move and not game_over:
+        make_move(*move)
+        print(f"Pydroid3: Computer ({difficulty}) moved from ({move[0]}, {move[1]}) to ({move[2]}, {move[3]})")
+
+def cancel_computer_move():
+    """Stop a running AI search and drop its move"""
+    global ai_future
+    if ai_future is not None:
+        ai_stop.set()
+        wait([ai_future])
+        ai_future = None
 
 def reset_game():
-    global board, selected_square, turn, game_over, winner, game_state, game_mode
+    global board, board_key, selected_square, turn, game_over, winner, game_state, game_mode
+    # Stop the AI first: it reads board and board_key, which must change together
+    cancel_computer_move()
+    ponderer.cancel()
     # Reset board
     board = [
         ['bR', 'bN', 'bB', 'bQ', 'bK', 'bB', 'bN', 'bR'],
@@ -898,6 +720,7 @@ def reset_game():
     # Reset game state variables
     selected_square = None
     turn = 'w'
+    board_key = zobrist_key(board, turn)
     game_over = False
     winner = None
     game_state = 'playing'
@@ -1106,11 +929,14 @@ def main():
                     print(f"Pydroid3: FINGERUP - x: {getattr(event, 'x', 'N/A')}, y: {getattr(event, 'y', 'N/A')}")
 
             if event.type == pygame.QUIT:
+                cancel_computer_move()
+                ai_executor.shutdown()
+                ponderer.cancel()
                 pygame.quit()
                 sys.exit()
             elif event.type == pygame.KEYDOWN:
                 # Debug keys - declare globals first
-                global game_state, winner, game_over
+                global game_state, winner, game_over, board_key
                 # Debug: Force win with 'W' key
                 if event.key == pygame.K_w:
                     game_state = 'white_wins'
@@ -1126,16 +952,20 @@ def main():
                 # Debug: Force checkmate test with 'C' key
                 elif event.key == pygame.K_c:
                     # Put black king in check with no escape
+                    cancel_computer_move()
                     board[0][4] = 'bK'  # Black king at a8
                     board[1][4] = 'wQ'  # White queen at a7
                     board[2][4] = 'wR'  # White rook at a6
+                    board_key = zobrist_key(board, turn)
                     print("FORCED CHECKMATE: Black king in checkmate position!")
                     check_game_state()
                 # Debug: Test check detection with 'T' key
                 elif event.key == pygame.K_t:
                     # Simple check test: place queen next to king
+                    cancel_computer_move()
                     board[0][4] = 'bK'  # Black king at e8
                     board[0][3] = 'wQ'  # White queen at d8 (adjacent to king)
+                    board_key = zobrist_key(board, turn)
                     print("CHECK TEST: Queen adjacent to king - should show red border!")
                     # Don't call check_game_state() here as we just want to test the visual
             elif game_over:
@@ -1185,6 +1015,9 @@ def main():
                                     break
                     except Exception as e:
                         print(f"Difficulty selection error: {e}")
+            elif ai_future is not None:
+                # The board is locked while the AI is thinking
+                pass
             elif event.type == pygame.MOUSEBUTTONDOWN or event.type == pygame.FINGERDOWN or (is_pydroid3 and event.type not in [pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEMOTION, pygame.FINGERMOTION, pygame.FINGERUP]):
                 try:
                     # Pydroid3-specific touch handling
@@ -1288,12 +1121,9 @@ def main():
                                     make_move(start_row, start_col, row, col)
                                     selected_square = None
                                     print(f"Pydroid3: Moved piece from ({start_row}, {start_col}) to ({row}, {col})")
-                                    # Computer's turn
+                                    # Computer's turn, searched off the event loop
                                     if not game_over:
-                                        move = get_computer_move(difficulty)
-                                        if move:
-                                            make_move(*move)
-                                            print(f"Pydroid3: Computer ({difficulty}) moved from ({move[0]}, {move[1]}) to ({move[2]}, {move[3]})")
+                                        start_computer_move()
                                 else:
                                     print(f"Pydroid3: Invalid move from ({start_row}, {start_col}) to ({row}, {col})")
                                     selected_square = None
@@ -1305,10 +1135,11 @@ def main():
 
                 except Exception as e:
                     print(f"Pydroid3: Touch event error: {e}")
-                    import traceback
                     traceback.print_exc()
                     selected_square = None
 
+        poll_computer_move()
+
         # Draw based on game mode
         if game_mode == 'selecting_difficulty':
             draw_difficulty_selection()
@@ -1318,6 +1149,8 @@ def main():
             draw_check_indicator()
             draw_touch_feedback()  # Add visual feedback for selected pieces
             draw_move_paths()  # Add move path visualization
+            if ai_future is not None:
+                draw_thinking_indicator()
 
             # Draw winning screen on top of everything
             if game_over:
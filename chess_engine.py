@@ -0,0 +1,782 @@
+"""
+Chess rules engine shared by the pygame and web front ends.
+
+Everything in here is pure Python with no pygame dependency so it can be
+imported headlessly (tests, search workers, the web build). NumPy is only
+used for batch evaluation, when it is installed.
+
+Boards use the same representation as chess.py: a list of eight rows of
+two-character strings such as 'wP' or '--', row 0 being black's back rank.
+"""
+import random
+import threading
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Offset tables for the leaper pieces (row delta, col delta)
+KNIGHT_OFFSETS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+# ---------------------------------------------------------------------------
+# Bitboard position backend
+#
+# Square numbering follows the list-of-lists board: square = row * 8 + col,
+# so bit 0 is a8 (board[0][0]) and bit 63 is h1 (board[7][7]).
+# ---------------------------------------------------------------------------
+
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+COLOR_NAMES = 'wb'
+PIECE_LETTERS = 'PNBRQK'
+# Piece index = color * 6 + piece type, e.g. 'wP' -> 0, 'bK' -> 11
+PIECE_NAMES = [color + letter for color in COLOR_NAMES for letter in PIECE_LETTERS]
+PIECE_INDEX = {name: index for index, name in enumerate(PIECE_NAMES)}
+EMPTY = -1
+
+FULL_BOARD = (1 << 64) - 1
+ROW_MASKS = [0xFF << (8 * row) for row in range(8)]
+# Rows 2-5 / cols 2-5, where pieces earn the center bonus
+CENTER_MASK = sum(1 << (row * 8 + col) for row in range(2, 6) for col in range(2, 6))
+
+# Material in centipawns, indexed by piece type
+PIECE_VALUES_CP = [100, 300, 300, 500, 900, 0]
+# Values for static exchange evaluation; a king "captured" at the end of an
+# exchange means its capture was illegal, so it costs more than any gain
+SEE_VALUES = PIECE_VALUES_CP[:5] + [20000]
+
+# Piece-square table: material plus a center bonus of a tenth of it for a
+# piece index on a square, signed black positive
+PIECE_SQUARE_VALUES = [
+    [(1 if piece // 6 == BLACK else -1) *
+     (PIECE_VALUES_CP[piece % 6] + (PIECE_VALUES_CP[piece % 6] // 10 if CENTER_MASK >> sq & 1 else 0))
+     for sq in range(64)]
+    for piece in range(12)
+]
+
+# Check the incremental evaluation against a full recompute on every call
+DEBUG_EVALUATION = False
+
+if hasattr(int, 'bit_count'):
+    def popcount(bb):
+        return bb.bit_count()
+else:  # Python < 3.10
+    def popcount(bb):
+        return bin(bb).count('1')
+
+def square(row, col):
+    return row * 8 + col
+
+def _leaper_table(offsets):
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        mask = 0
+        for d_row, d_col in offsets:
+            if 0 <= row + d_row < 8 and 0 <= col + d_col < 8:
+                mask |= 1 << square(row + d_row, col + d_col)
+        table.append(mask)
+    return table
+
+KNIGHT_ATTACKS = _leaper_table(KNIGHT_OFFSETS)
+KING_ATTACKS = _leaper_table(KING_OFFSETS)
+# Squares attacked by a pawn of the given color standing on each square
+PAWN_ATTACKS = [_leaper_table([(-1, -1), (-1, 1)]), _leaper_table([(1, -1), (1, 1)])]
+
+# Rays are indexed by direction; the first four step to higher squares, so
+# their nearest blocker is the lowest set bit, the last four the highest.
+RAY_DIRECTIONS = [(1, 0), (0, 1), (1, -1), (1, 1), (-1, 0), (0, -1), (-1, -1), (-1, 1)]
+
+def _ray_table(d_row, d_col):
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        mask = 0
+        row += d_row
+        col += d_col
+        while 0 <= row < 8 and 0 <= col < 8:
+            mask |= 1 << square(row, col)
+            row += d_row
+            col += d_col
+        table.append(mask)
+    return table
+
+RAYS = [_ray_table(d_row, d_col) for d_row, d_col in RAY_DIRECTIONS]
+ROOK_RAYS = [(RAYS[0], True), (RAYS[1], True), (RAYS[4], False), (RAYS[5], False)]
+BISHOP_RAYS = [(RAYS[2], True), (RAYS[3], True), (RAYS[6], False), (RAYS[7], False)]
+
+def _slider_attacks(sq, occupied, rays):
+    attacks = 0
+    for table, positive in rays:
+        ray = table[sq]
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= table[blocker]
+        attacks |= ray
+    return attacks
+
+def rook_attacks(sq, occupied):
+    return _slider_attacks(sq, occupied, ROOK_RAYS)
+
+def bishop_attacks(sq, occupied):
+    return _slider_attacks(sq, occupied, BISHOP_RAYS)
+
+# ---------------------------------------------------------------------------
+# Precomputed attack tables
+#
+# Every attack question below is answered by table lookups: leaper attack
+# sets per square, the rays through each square, and the squares strictly
+# between two aligned squares. Nothing re-derives geometry at query time.
+# ---------------------------------------------------------------------------
+
+ROOK_MASK = [RAYS[0][sq] | RAYS[1][sq] | RAYS[4][sq] | RAYS[5][sq] for sq in range(64)]
+BISHOP_MASK = [RAYS[2][sq] | RAYS[3][sq] | RAYS[6][sq] | RAYS[7][sq] for sq in range(64)]
+
+def _between_table():
+    between = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        for d in range(8):
+            ray = RAYS[d][sq]
+            target_bits = ray
+            while target_bits:
+                low = target_bits & -target_bits
+                target = low.bit_length() - 1
+                target_bits ^= low
+                between[sq][target] = ray & ~RAYS[d][target] & ~low
+    return between
+
+# BETWEEN[a][b]: squares strictly between two aligned squares (0 otherwise)
+BETWEEN = _between_table()
+
+def encode_move(from_sq, to_sq):
+    return from_sq | (to_sq << 6)
+
+def move_to_tuple(move):
+    """Convert a packed move to the (start_row, start_col, end_row, end_col) tuples used by the UI"""
+    from_sq = move & 63
+    to_sq = move >> 6
+    return (from_sq >> 3, from_sq & 7, to_sq >> 3, to_sq & 7)
+
+def move_to_text(move):
+    """Coordinate notation for a packed move, e.g. 'e2e4'"""
+    from_sq = move & 63
+    to_sq = move >> 6
+    return ('abcdefgh'[from_sq & 7] + str(8 - (from_sq >> 3)) +
+            'abcdefgh'[to_sq & 7] + str(8 - (to_sq >> 3)))
+
+def tuple_to_move(move):
+    start_row, start_col, end_row, end_col = move
+    return square(start_row, start_col) | (square(end_row, end_col) << 6)
+
+# Zobrist keys: one random 64-bit number per (piece, square) plus one for
+# black to move. The seed is fixed so every process (search workers, the
+# web build) derives identical keys. These rules have no castling or en
+# passant, so there is no extra state to hash.
+_zobrist_random = random.Random(0x5EED1E55)
+ZOBRIST_PIECES = [[_zobrist_random.getrandbits(64) for _ in range(64)] for _ in range(12)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+
+def zobrist_key(board, turn='w'):
+    """Compute the Zobrist key of a list-of-lists board from scratch"""
+    key = ZOBRIST_BLACK_TO_MOVE if turn == 'b' else 0
+    for row in range(8):
+        for col in range(8):
+            piece = board[row][col]
+            if piece != '--':
+                key ^= ZOBRIST_PIECES[PIECE_INDEX[piece]][row * 8 + col]
+    return key
+
+def update_zobrist_key(key, piece, captured, start_row, start_col, end_row, end_col):
+    """Incrementally update a key for a move of `piece` (names like 'wP') that also switches the turn"""
+    index = PIECE_INDEX[piece]
+    key ^= ZOBRIST_PIECES[index][start_row * 8 + start_col] ^ ZOBRIST_PIECES[index][end_row * 8 + end_col]
+    if captured != '--':
+        key ^= ZOBRIST_PIECES[PIECE_INDEX[captured]][end_row * 8 + end_col]
+    return key ^ ZOBRIST_BLACK_TO_MOVE
+
+class Position:
+    """Chess position stored as twelve piece bitboards plus occupancy masks"""
+
+    def __init__(self):
+        self.pieces = [0] * 12          # one bitboard per piece index
+        self.occupancy = [0, 0]         # all white / all black pieces
+        self.occupied = 0
+        self.squares = [EMPTY] * 64     # piece index on each square, for captures
+        self.side = WHITE
+        self.key = 0                    # Zobrist key, kept up to date incrementally
+        self.pawn_key = 0               # Zobrist key of the pawns alone, for the pawn hash table
+        self.score = 0                  # PIECE_SQUARE_VALUES total, also incremental
+        self.history = []               # undo stack, one entry per make_move
+
+    @classmethod
+    def from_board(cls, board, turn='w'):
+        """Build a position from the list-of-lists board used by the UI"""
+        position = cls()
+        for row in range(8):
+            for col in range(8):
+                piece = board[row][col]
+                if piece != '--':
+                    position.put_piece(PIECE_INDEX[piece], square(row, col))
+        position.side = COLOR_NAMES.index(turn)
+        if position.side == BLACK:
+            position.key ^= ZOBRIST_BLACK_TO_MOVE
+        return position
+
+    def to_board(self):
+        """Convert back to the list-of-lists board used by draw_pieces and get_board_state"""
+        board = []
+        for row in range(8):
+            board.append([PIECE_NAMES[p] if p != EMPTY else '--' for p in self.squares[row * 8:row * 8 + 8]])
+        return board
+
+    def copy(self):
+        position = Position.__new__(Position)
+        position.pieces = self.pieces[:]
+        position.occupancy = self.occupancy[:]
+        position.occupied = self.occupied
+        position.squares = self.squares[:]
+        position.side = self.side
+        position.key = self.key
+        position.pawn_key = self.pawn_key
+        position.score = self.score
+        position.history = []
+        return position
+
+    @property
+    def turn(self):
+        return COLOR_NAMES[self.side]
+
+    def put_piece(self, piece, sq):
+        bit = 1 << sq
+        self.pieces[piece] |= bit
+        self.occupancy[piece // 6] |= bit
+        self.occupied |= bit
+        self.squares[sq] = piece
+        self.key ^= ZOBRIST_PIECES[piece][sq]
+        if piece % 6 == PAWN:
+            self.pawn_key ^= ZOBRIST_PIECES[piece][sq]
+        self.score += PIECE_SQUARE_VALUES[piece][sq]
+
+    def remove_piece(self, sq):
+        piece = self.squares[sq]
+        if piece != EMPTY:
+            bit = 1 << sq
+            self.pieces[piece] ^= bit
+            self.occupancy[piece // 6] ^= bit
+            self.occupied ^= bit
+            self.squares[sq] = EMPTY
+            self.key ^= ZOBRIST_PIECES[piece][sq]
+            if piece % 6 == PAWN:
+                self.pawn_key ^= ZOBRIST_PIECES[piece][sq]
+            self.score -= PIECE_SQUARE_VALUES[piece][sq]
+        return piece
+
+    def king_square(self, color):
+        kings = self.pieces[color * 6 + KING]
+        if not kings:
+            return -1
+        return (kings & -kings).bit_length() - 1
+
+    def attackers_to(self, sq, by_color, occupied=None):
+        """Bitboard of by_color pieces attacking sq, through the given occupancy"""
+        if occupied is None:
+            occupied = self.occupied
+        pieces = self.pieces
+        base = by_color * 6
+        queens = pieces[base + QUEEN]
+        return ((PAWN_ATTACKS[by_color ^ 1][sq] & pieces[base + PAWN])
+                | (KNIGHT_ATTACKS[sq] & pieces[base + KNIGHT])
+                | (KING_ATTACKS[sq] & pieces[base + KING])
+                | (bishop_attacks(sq, occupied) & (pieces[base + BISHOP] | queens))
+                | (rook_attacks(sq, occupied) & (pieces[base + ROOK] | queens)))
+
+    def see(self, move):
+        """Static exchange evaluation: net centipawns won by `move` for the side making it.
+
+        Both sides then keep recapturing on the target square with their
+        least valuable attacker, each free to stop when going on would lose
+        material. Pieces that have captured are taken out of the occupancy,
+        so sliders behind them join in. The exchange is cut short once
+        neither side can come out ahead, which keeps the sign exact but can
+        overstate a loss. Pins are ignored. Nothing is moved on the board.
+        """
+        from_sq = move & 63
+        to_sq = move >> 6
+        squares = self.squares
+        pieces = self.pieces
+        piece = squares[from_sq]
+        captured = squares[to_sq]
+        gain = [SEE_VALUES[captured % 6] if captured != EMPTY else 0]
+        on_square = SEE_VALUES[piece % 6]
+        occupied = self.occupied ^ (1 << from_sq)
+        side = piece // 6 ^ 1
+        while True:
+            attackers = self.attackers_to(to_sq, side, occupied) & occupied
+            if not attackers:
+                break
+            base = side * 6
+            for piece_type in range(6):
+                candidates = attackers & pieces[base + piece_type]
+                if candidates:
+                    break
+            gain.append(on_square - gain[-1])
+            if max(-gain[-2], gain[-1]) < 0:
+                # Neither side comes out ahead by going on; the capture
+                # just scored was never made, so it must not be backed up
+                gain.pop()
+                break
+            occupied ^= candidates & -candidates
+            on_square = SEE_VALUES[piece_type]
+            side ^= 1
+        # Let each side stop the exchange where it is best for it
+        for index in range(len(gain) - 1, 0, -1):
+            gain[index - 1] = -max(-gain[index - 1], gain[index])
+        return gain[0]
+
+    def is_square_attacked(self, sq, by_color, occupied=None):
+        """Reverse attack query: look outward from sq for by_color attackers"""
+        if occupied is None:
+            occupied = self.occupied
+        pieces = self.pieces
+        base = by_color * 6
+        if KNIGHT_ATTACKS[sq] & pieces[base + KNIGHT]:
+            return True
+        if PAWN_ATTACKS[by_color ^ 1][sq] & pieces[base + PAWN]:
+            return True
+        if KING_ATTACKS[sq] & pieces[base + KING]:
+            return True
+        queens = pieces[base + QUEEN]
+        # Only walk the rays when a slider sits somewhere on them
+        diagonal = BISHOP_MASK[sq] & (pieces[base + BISHOP] | queens)
+        if diagonal and bishop_attacks(sq, occupied) & diagonal:
+            return True
+        straight = ROOK_MASK[sq] & (pieces[base + ROOK] | queens)
+        if straight and rook_attacks(sq, occupied) & straight:
+            return True
+        return False
+
+    def in_check(self, color=None):
+        if color is None:
+            color = self.side
+        king_sq = self.king_square(color)
+        return king_sq >= 0 and self.is_square_attacked(king_sq, color ^ 1)
+
+    def pseudo_legal_targets(self, sq):
+        """Bitboard of squares the piece on sq can reach, ignoring king safety"""
+        piece = self.squares[sq]
+        color = piece // 6
+        piece_type = piece % 6
+        own = self.occupancy[color]
+        if piece_type == PAWN:
+            empty = ~self.occupied & FULL_BOARD
+            if color == WHITE:
+                single = ((1 << sq) >> 8) & empty
+                double = ((single & ROW_MASKS[5]) >> 8) & empty
+            else:
+                single = ((1 << sq) << 8) & empty
+                double = ((single & ROW_MASKS[2]) << 8) & empty
+            return single | double | (PAWN_ATTACKS[color][sq] & self.occupancy[color ^ 1])
+        if piece_type == KNIGHT:
+            return KNIGHT_ATTACKS[sq] & ~own
+        if piece_type == KING:
+            return KING_ATTACKS[sq] & ~own
+        if piece_type == BISHOP:
+            return bishop_attacks(sq, self.occupied) & ~own
+        if piece_type == ROOK:
+            return rook_attacks(sq, self.occupied) & ~own
+        return (bishop_attacks(sq, self.occupied) | rook_attacks(sq, self.occupied)) & ~own
+
+    def checkers_and_pins(self, color):
+        """Pieces giving check to color's king, plus {pinned square: squares it may still move to}"""
+        king_sq = self.king_square(color)
+        if king_sq < 0:
+            return 0, {}
+        them = color ^ 1
+        base = them * 6
+        pieces = self.pieces
+        occupied = self.occupied
+        own = self.occupancy[color]
+        checkers = self.attackers_to(king_sq, them)
+
+        pins = {}
+        queens = pieces[base + QUEEN]
+        # Enemy sliders lined up with the king, looking through everything
+        snipers = ((ROOK_MASK[king_sq] & (pieces[base + ROOK] | queens)) |
+                   (BISHOP_MASK[king_sq] & (pieces[base + BISHOP] | queens)))
+        while snipers:
+            low = snipers & -snipers
+            sniper = low.bit_length() - 1
+            snipers ^= low
+            blockers = BETWEEN[king_sq][sniper] & occupied
+            # Exactly one blocker, and it is ours: it is pinned to the line
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pins[blockers.bit_length() - 1] = BETWEEN[king_sq][sniper] | low
+        return checkers, pins
+
+    def _legal_target_sets(self, color):
+        """Yield (from_sq, legal targets bitboard) using pins and checkers instead of make-and-test"""
+        them = color ^ 1
+        own = self.occupancy[color]
+        king_sq = self.king_square(color)
+        checkers, pins = self.checkers_and_pins(color)
+
+        if king_sq >= 0:
+            # King steps are checked with the king lifted off the board so
+            # it cannot hide behind itself from a slider
+            occupied = self.occupied ^ (1 << king_sq)
+            targets = KING_ATTACKS[king_sq] & ~own
+            safe = 0
+            while targets:
+                low = targets & -targets
+                targets ^= low
+                if not self.is_square_attacked(low.bit_length() - 1, them, occupied):
+                    safe |= low
+            yield king_sq, safe
+
+            if checkers & (checkers - 1):
+                return  # Double check: only the king may move
+            if checkers:
+                checker_sq = checkers.bit_length() - 1
+                # Capture the checker or block the line
+                evasions = checkers | BETWEEN[king_sq][checker_sq]
+            else:
+                evasions = FULL_BOARD
+        else:
+            evasions = FULL_BOARD
+
+        bb = own & ~(1 << king_sq) if king_sq >= 0 else own
+        while bb:
+            low = bb & -bb
+            from_sq = low.bit_length() - 1
+            bb ^= low
+            targets = self.pseudo_legal_targets(from_sq) & evasions
+            if from_sq in pins:
+                targets &= pins[from_sq]
+            yield from_sq, targets
+
+    def generate_moves(self, color=None):
+        """Generate legal moves as packed integers (see encode_move)"""
+        if color is None:
+            color = self.side
+        moves = []
+        for from_sq, targets in self._legal_target_sets(color):
+            while targets:
+                low = targets & -targets
+                targets ^= low
+                moves.append(from_sq | ((low.bit_length() - 1) << 6))
+        return moves
+
+    def generate_captures(self, color=None):
+        """Generate only the legal moves that capture a piece"""
+        if color is None:
+            color = self.side
+        enemy = self.occupancy[color ^ 1]
+        moves = []
+        for from_sq, targets in self._legal_target_sets(color):
+            targets &= enemy
+            while targets:
+                low = targets & -targets
+                targets ^= low
+                moves.append(from_sq | ((low.bit_length() - 1) << 6))
+        return moves
+
+    def has_legal_moves(self, color=None):
+        if color is None:
+            color = self.side
+        for _, targets in self._legal_target_sets(color):
+            if targets:
+                return True
+        return False
+
+    def make_move(self, move):
+        """Play a move in place, pushing an undo entry (move, moved piece, captured piece, old key, old score)"""
+        from_sq = move & 63
+        to_sq = move >> 6
+        squares = self.squares
+        pieces = self.pieces
+        occupancy = self.occupancy
+        piece = squares[from_sq]
+        captured = squares[to_sq]
+        from_bit = 1 << from_sq
+        to_bit = 1 << to_sq
+        self.history.append((move, piece, captured, self.key, self.score))
+
+        key = self.key ^ ZOBRIST_PIECES[piece][from_sq] ^ ZOBRIST_PIECES[piece][to_sq] ^ ZOBRIST_BLACK_TO_MOVE
+        psq = PIECE_SQUARE_VALUES[piece]
+        score = self.score + psq[to_sq] - psq[from_sq]
+        if captured != EMPTY:
+            pieces[captured] ^= to_bit
+            occupancy[captured // 6] ^= to_bit
+            self.occupied ^= to_bit
+            key ^= ZOBRIST_PIECES[captured][to_sq]
+            score -= PIECE_SQUARE_VALUES[captured][to_sq]
+            if captured % 6 == PAWN:
+                self.pawn_key ^= ZOBRIST_PIECES[captured][to_sq]
+        if piece % 6 == PAWN:
+            self.pawn_key ^= ZOBRIST_PIECES[piece][from_sq] ^ ZOBRIST_PIECES[piece][to_sq]
+        self.key = key
+        self.score = score
+        pieces[piece] ^= from_bit | to_bit
+        occupancy[piece // 6] ^= from_bit | to_bit
+        self.occupied ^= from_bit | to_bit
+        squares[from_sq] = EMPTY
+        squares[to_sq] = piece
+        self.side ^= 1
+
+    def make_null_move(self):
+        """Pass the turn without moving, for null-move pruning"""
+        self.history.append((None, EMPTY, EMPTY, self.key, self.score))
+        self.key ^= ZOBRIST_BLACK_TO_MOVE
+        self.side ^= 1
+
+    def has_non_pawn_material(self, color=None):
+        """True if color has anything besides pawns and the king"""
+        color = self.side if color is None else color
+        base = color * 6
+        return bool(self.occupancy[color] & ~(self.pieces[base + PAWN] | self.pieces[base + KING]))
+
+    def unmake_move(self):
+        """Take back the last move made with make_move or make_null_move"""
+        move, piece, captured, self.key, self.score = self.history.pop()
+        if move is None:
+            self.side ^= 1
+            return
+        from_sq = move & 63
+        to_sq = move >> 6
+        from_bit = 1 << from_sq
+        to_bit = 1 << to_sq
+        pieces = self.pieces
+        occupancy = self.occupancy
+
+        self.side ^= 1
+        pieces[piece] ^= from_bit | to_bit
+        occupancy[piece // 6] ^= from_bit | to_bit
+        self.occupied ^= from_bit | to_bit
+        self.squares[from_sq] = piece
+        self.squares[to_sq] = captured
+        if captured != EMPTY:
+            pieces[captured] |= to_bit
+            occupancy[captured // 6] |= to_bit
+            self.occupied |= to_bit
+            if captured % 6 == PAWN:
+                self.pawn_key ^= ZOBRIST_PIECES[captured][to_sq]
+        # XOR undoes itself, so the pawn key needs no slot in the undo entry
+        if piece % 6 == PAWN:
+            self.pawn_key ^= ZOBRIST_PIECES[piece][from_sq] ^ ZOBRIST_PIECES[piece][to_sq]
+
+    def evaluate(self):
+        """Material plus center bonus in centipawns (black positive), in O(1)"""
+        if DEBUG_EVALUATION:
+            expected = self.evaluate_full()
+            assert self.score == expected, f"incremental score {self.score} drifted from {expected}"
+        return self.score
+
+    def evaluate_full(self):
+        """Recompute the evaluation from the bitboards"""
+        pieces = self.pieces
+        score = 0
+        for t in range(5):
+            white = pieces[t]
+            black = pieces[6 + t]
+            value = PIECE_VALUES_CP[t]
+            score += value * (popcount(black) - popcount(white))
+            score += value // 10 * (popcount(black & CENTER_MASK) - popcount(white & CENTER_MASK))
+        return score
+
+
+# Positions kept by LegalMoveCache: the current one, a few just played and
+# the ones the UI looks at while the AI thinks
+LEGAL_MOVE_CACHE_SIZE = 64
+
+class LegalMoveCache:
+    """Legal moves and check status per position, keyed by Zobrist key, with LRU eviction.
+
+    The front end asks about the same position every frame (move
+    highlights, check borders) and again for game-end checks and the AI's
+    move lists; this generates each answer once per position. Entries are
+    filled lazily, per color. Returned move lists are shared, so callers
+    must not modify them. A lock makes it safe to use from the AI thread
+    and the event loop at once.
+    """
+
+    def __init__(self, size=LEGAL_MOVE_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()    # key -> [position, moves by color, in check by color]
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def _entry(self, key, board, turn):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = [Position.from_board(board, turn), [None, None], [None, None]]
+            self.entries[key] = entry
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return entry
+
+    def legal_moves(self, key, board, turn, color=None):
+        """Packed legal moves for color (default: the side to move) in the position with this key"""
+        with self.lock:
+            position, moves, _ = self._entry(key, board, turn)
+            color = position.side if color is None else color
+            if moves[color] is None:
+                moves[color] = position.generate_moves(color)
+            return moves[color]
+
+    def in_check(self, key, board, turn, color=None):
+        with self.lock:
+            position, _, checks = self._entry(key, board, turn)
+            color = position.side if color is None else color
+            if checks[color] is None:
+                checks[color] = position.in_check(color)
+            return checks[color]
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / probes if probes else 0.0
+        }
+
+
+# ---------------------------------------------------------------------------
+# Pawn structure
+#
+# Doubled, isolated and passed pawns depend on the pawns alone, so the
+# search caches evaluate_pawn_structure by Position.pawn_key. The king
+# shield also depends on where the kings stand; it is two mask lookups, so
+# it is computed on every call instead. Scores are black positive.
+# ---------------------------------------------------------------------------
+
+DOUBLED_PAWN_PENALTY = 15       # per pawn beyond the first on a file
+ISOLATED_PAWN_PENALTY = 12
+# Passed pawn bonus by rows advanced from the starting row. Pawns do not
+# promote in this game, so one stuck on the last row gets nothing
+PASSED_PAWN_BONUS = [5, 10, 15, 25, 35, 50, 0]
+KING_SHIELD_BONUS = 8           # per own pawn on the three squares in front of the king
+
+FILE_MASKS = [sum(1 << square(row, col) for row in range(8)) for col in range(8)]
+ADJACENT_FILE_MASKS = [(FILE_MASKS[col - 1] if col > 0 else 0) | (FILE_MASKS[col + 1] if col < 7 else 0)
+                       for col in range(8)]
+
+def _ahead_mask(color, sq, files):
+    """Squares on the given files in front of sq from color's side"""
+    row = sq // 8
+    rows = range(row) if color == WHITE else range(row + 1, 8)
+    return sum(1 << square(r, c) for r in rows for c in files if 0 <= c < 8)
+
+# Squares an enemy pawn would have to stand on to stop a pawn on sq
+PASSED_PAWN_MASKS = [[_ahead_mask(color, sq, (sq % 8 - 1, sq % 8, sq % 8 + 1)) for sq in range(64)]
+                     for color in (WHITE, BLACK)]
+def _shield_mask(color, sq):
+    front = sq // 8 - 1 if color == WHITE else sq // 8 + 1
+    return KING_ATTACKS[sq] & ROW_MASKS[front] if 0 <= front < 8 else 0
+
+# The three squares directly in front of a king
+KING_SHIELD_MASKS = [[_shield_mask(color, sq) for sq in range(64)] for color in (WHITE, BLACK)]
+
+def _pawn_terms(color, own, enemy):
+    """Doubled, isolated and passed pawn score for one side's pawns"""
+    score = 0
+    for col in range(8):
+        count = popcount(own & FILE_MASKS[col])
+        if count:
+            if count > 1:
+                score -= DOUBLED_PAWN_PENALTY * (count - 1)
+            if not own & ADJACENT_FILE_MASKS[col]:
+                score -= ISOLATED_PAWN_PENALTY * count
+    passed_masks = PASSED_PAWN_MASKS[color]
+    pawns = own
+    while pawns:
+        bit = pawns & -pawns
+        pawns ^= bit
+        sq = bit.bit_length() - 1
+        if not enemy & passed_masks[sq]:
+            row = sq // 8
+            score += PASSED_PAWN_BONUS[6 - row if color == WHITE else row - 1]
+    return score
+
+def evaluate_pawn_structure(white_pawns, black_pawns):
+    """Doubled, isolated and passed pawn terms for two pawn bitboards"""
+    return _pawn_terms(BLACK, black_pawns, white_pawns) - _pawn_terms(WHITE, white_pawns, black_pawns)
+
+def evaluate_king_shields(position):
+    """Bonus for pawns sheltering each king"""
+    pieces = position.pieces
+    score = 0
+    for color, sign in ((WHITE, -1), (BLACK, 1)):
+        kings = pieces[color * 6 + KING]
+        if kings:
+            shield = KING_SHIELD_MASKS[color][kings.bit_length() - 1]
+            score += sign * KING_SHIELD_BONUS * popcount(pieces[color * 6 + PAWN] & shield)
+    return score
+
+
+# ---------------------------------------------------------------------------
+# Batch evaluation
+#
+# Positions are encoded as rows of 64 piece indexes (EMPTY for an empty
+# square), an (N, 64) int8 array when NumPy is available. All rows are scored
+# in one vectorized pass with the same material and center bonus as
+# Position.evaluate. Without NumPy the same functions work on plain lists.
+# ---------------------------------------------------------------------------
+
+if np is not None:
+    # Signed material by piece index; the extra last entry is hit by EMPTY (-1)
+    _BATCH_MATERIAL = np.array([(1 if piece // 6 == BLACK else -1) * PIECE_VALUES_CP[piece % 6]
+                                for piece in range(12)] + [0], dtype=np.int32)
+    _BATCH_CENTER = np.array([CENTER_MASK >> sq & 1 for sq in range(64)], dtype=bool)
+
+def encode_children(position, moves):
+    """Encode the position after each move, one row per move"""
+    squares = position.squares
+    if np is None:
+        rows = []
+        for move in moves:
+            row = squares[:]
+            row[move >> 6] = row[move & 63]
+            row[move & 63] = EMPTY
+            rows.append(row)
+        return rows
+    moves = np.asarray(moves, dtype=np.int32)
+    from_sq = moves & 63
+    to_sq = moves >> 6
+    batch = np.tile(np.asarray(squares, dtype=np.int8), (len(moves), 1))
+    index = np.arange(len(moves))
+    batch[index, to_sq] = batch[index, from_sq]
+    batch[index, from_sq] = EMPTY
+    return batch
+
+def evaluate_batch(encoded):
+    """Black-positive centipawn scores for encoded positions, matching Position.evaluate"""
+    if np is None:
+        return [sum(PIECE_SQUARE_VALUES[piece][sq] for sq, piece in enumerate(row) if piece != EMPTY)
+                for row in encoded]
+    material = _BATCH_MATERIAL[encoded]
+    # The center bonus is a tenth of the material on the 4x4 center
+    return (material.sum(axis=1) + (material[:, _BATCH_CENTER] // 10).sum(axis=1)).tolist()
+
+def evaluate_moves(position, moves):
+    """Score every child of position in one batch; returns black-positive scores"""
+    if not moves:
+        return []
+    return evaluate_batch(encode_children(position, moves))
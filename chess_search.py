@@ -0,0 +1,1098 @@
+"""
+Game tree search for the chess AI.
+
+Searches run on chess_engine.Position objects using make/unmake. Scores are
+integers in centipawns from the point of view of the side to move
+(negamax), so callers that want Position.evaluate's black-positive scale
+convert at the edge.
+
+ParallelSearcher splits the root moves across worker processes on desktop
+installs, and LazySMPSearcher runs whole searches in several processes over
+one shared-memory table. Both fall back to the single-process Searcher
+where there is one core or no multiprocessing (Pyodide).
+"""
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+
+try:
+    import multiprocessing
+    from multiprocessing import shared_memory
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    multiprocessing = None
+
+from chess_engine import (BLACK, EMPTY, PIECE_VALUES_CP, PAWN, KING, popcount, evaluate_pawn_structure,
+                          evaluate_king_shields)
+from chess_tablebase import WIN, LOSS
+
+MATE_SCORE = 100000
+# Scores beyond this are "mate in N" and need ply adjustment in the table
+MATE_THRESHOLD = MATE_SCORE - 1000
+INFINITY = 1000000
+
+# Bound types stored in the transposition table (0 marks an empty slot)
+EXACT, LOWER_BOUND, UPPER_BOUND = 1, 2, 3
+
+# Packed entry layout (one 64-bit data word; the word before it holds
+# key ^ data so a slot half-written by another process never matches):
+#   bits 0-11  best move (encode_move), 4095 when there is none
+#   bits 12-19 depth
+#   bits 20-21 bound type
+#   bits 22-27 search generation, so old deep entries can be replaced
+#   bits 28-59 score + 2**31
+_NO_MOVE = 0xFFF
+_SCORE_OFFSET = 1 << 31
+_ENTRY_BYTES = 16       # checked key word + data word
+_BUCKET_SLOTS = 2       # slot 0 depth-preferred, slot 1 always-replace
+
+# Tables are zeroed a chunk at a time: array('Q', bytes(n)) would hold the
+# bytes object and the array at once, twice the memory budget
+_ZERO_CHUNK = array('Q', [0]) * 8192
+
+def _zero_words(words):
+    """Zero an array or memoryview of 64-bit words in place"""
+    chunk = len(_ZERO_CHUNK)
+    for start in range(0, len(words), chunk):
+        end = min(start + chunk, len(words))
+        words[start:end] = _ZERO_CHUNK[:end - start]
+
+class TranspositionTable:
+    """Fixed-size hash table of search results, preallocated to a strict memory budget"""
+
+    def __init__(self, size_mb=16):
+        buckets = max(1, size_mb * 1024 * 1024 // (_ENTRY_BYTES * _BUCKET_SLOTS))
+        # Round down to a power of two so the index is a mask
+        self.bucket_count = 1 << (buckets.bit_length() - 1)
+        self.mask = self.bucket_count - 1
+        # Two words per slot: [key ^ data, data]
+        self.table = array('Q', [0]) * (self.bucket_count * _BUCKET_SLOTS * 2)
+        self.generation = 0
+        self.reset_stats()
+
+    @property
+    def size_bytes(self):
+        return self.table.itemsize * len(self.table)
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def stats(self):
+        """Counters for sizing the table"""
+        return {
+            'size_mb': self.size_bytes / (1024 * 1024),
+            'entries': self.bucket_count * _BUCKET_SLOTS,
+            'probes': self.probes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / self.probes if self.probes else 0.0,
+            'stores': self.stores,
+            'overwrites': self.overwrites
+        }
+
+    def clear(self):
+        _zero_words(self.table)
+        self.generation = 0
+        self.reset_stats()
+
+    def new_search(self):
+        """Age the table so entries from earlier searches lose their depth priority"""
+        self.generation = (self.generation + 1) & 63
+
+    def probe(self, key):
+        """Return (move, depth, bound, score) for key, or None; move is None if unknown"""
+        self.probes += 1
+        table = self.table
+        index = (key & self.mask) * 4
+        for offset in (0, 2):
+            data = table[index + offset + 1]
+            if table[index + offset] ^ data == key:
+                if data >> 20 & 3:
+                    self.hits += 1
+                    move = data & 0xFFF
+                    return (None if move == _NO_MOVE else move, data >> 12 & 0xFF,
+                            data >> 20 & 3, (data >> 28) - _SCORE_OFFSET)
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        table = self.table
+        index = (key & self.mask) * 4
+        data = ((_NO_MOVE if move is None else move) | (depth << 12) | (bound << 20) |
+                (self.generation << 22) | ((score + _SCORE_OFFSET) << 28))
+
+        # Depth-preferred slot: take it for the same position, a deeper
+        # result, an empty slot, or one left over from an earlier search
+        old_data = table[index + 1]
+        old_key = table[index] ^ old_data
+        if (old_key == key or not old_data >> 20 & 3 or depth >= (old_data >> 12 & 0xFF) or
+                (old_data >> 22 & 63) != self.generation):
+            slot = index
+        else:
+            slot = index + 2  # Always-replace slot
+            old_data = table[slot + 1]
+            old_key = table[slot] ^ old_data
+        if old_key != key and old_data >> 20 & 3:
+            self.overwrites += 1
+        self.stores += 1
+        table[slot] = key ^ data
+        table[slot + 1] = data
+
+class SharedTranspositionTable(TranspositionTable):
+    """TranspositionTable in multiprocessing.shared_memory, shared by Lazy SMP workers.
+
+    Writers do not lock: entries are XOR-checked, so a slot torn by two
+    processes writing at once just reads as a miss. The last two words of
+    the segment hold the bucket count, so attaching processes index the
+    table exactly like its creator, and the search generation, so every
+    process ages entries alike. Workers attach with SharedTranspositionTable.attach(name).
+    """
+
+    def __init__(self, size_mb=16, name=None):
+        if name is None:
+            buckets = max(1, size_mb * 1024 * 1024 // (_ENTRY_BYTES * _BUCKET_SLOTS))
+            bucket_count = 1 << (buckets.bit_length() - 1)
+            size = bucket_count * _BUCKET_SLOTS * _ENTRY_BYTES + 16
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.words = self.shm.buf.cast('Q')
+        if self.owner:
+            self.words[-2] = bucket_count
+        self.bucket_count = self.words[-2]
+        self.mask = self.bucket_count - 1
+        # The segment may be rounded up to whole pages; only the table is indexed
+        self.table = self.words[:self.bucket_count * _BUCKET_SLOTS * 2]
+        self.reset_stats()
+
+    @classmethod
+    def attach(cls, name):
+        return cls(name=name)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def size_bytes(self):
+        return self.table.nbytes
+
+    @property
+    def generation(self):
+        return self.words[-1]
+
+    @generation.setter
+    def generation(self, value):
+        self.words[-1] = value
+
+    def clear(self):
+        _zero_words(self.table)
+        self.words[-1] = 0
+        self.reset_stats()
+
+    def close(self):
+        """Detach from the segment; the creating process also frees it"""
+        if self.shm is None:
+            return
+        self.table.release()
+        self.words.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
+
+# Pawn hash table size in entries; pawn structures repeat so much that a
+# small table hits almost every time
+PAWN_TABLE_ENTRIES = 1 << 14
+
+class PawnHashTable:
+    """Fixed-size cache of evaluate_pawn_structure scores keyed by Position.pawn_key.
+
+    Each slot holds the full key and the score, and a new structure simply
+    replaces whatever shares its slot. An empty slot has key 0, which is
+    also the key of a board without pawns, whose score is 0 as well.
+    """
+
+    def __init__(self, entries=PAWN_TABLE_ENTRIES):
+        size = 1 << (entries.bit_length() - 1)
+        self.mask = size - 1
+        self.keys = array('Q', [0]) * size
+        self.scores = array('i', [0]) * size
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+
+    def stats(self):
+        return {
+            'entries': len(self.keys),
+            'probes': self.probes,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.probes if self.probes else 0.0
+        }
+
+    def clear(self):
+        self.keys = array('Q', [0]) * len(self.keys)
+        self.scores = array('i', [0]) * len(self.scores)
+        self.reset_stats()
+
+    def score(self, position):
+        """Pawn structure score (black positive), computed and stored on a miss"""
+        key = position.pawn_key
+        index = key & self.mask
+        self.probes += 1
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.scores[index]
+        pieces = position.pieces
+        score = evaluate_pawn_structure(pieces[PAWN], pieces[6 + PAWN])
+        self.keys[index] = key
+        self.scores[index] = score
+        return score
+
+def _score_to_tt(score, ply):
+    """Store mate scores relative to this node rather than the root"""
+    if score > MATE_THRESHOLD:
+        return score + ply
+    if score < -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+def _score_from_tt(score, ply):
+    if score > MATE_THRESHOLD:
+        return score - ply
+    if score < -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+# Move ordering: hash move, then captures by most valuable victim / least
+# valuable attacker, then killer moves, then quiet moves by history score,
+# then captures that lose material by static exchange evaluation
+HASH_MOVE_SCORE = 1 << 40
+CAPTURE_SCORE = 1 << 36
+KILLER_SCORE = 1 << 32
+HISTORY_LIMIT = 1 << 30
+# Victim/attacker values for MVV-LVA; the king is the most valuable attacker
+ORDER_VALUES = PIECE_VALUES_CP[:KING] + [2000]
+MAX_PLY = 128
+# Half-width of the aspiration window around the previous iteration's score
+ASPIRATION_WINDOW = 50
+# Quiescence delta pruning: skip captures that cannot lift the score to
+# alpha even with this much positional slack on top of the victim's value
+DELTA_MARGIN = 200
+CUTOFF_HISTOGRAM_SIZE = 8   # last bucket collects "8th move or later"
+# Null-move pruning: depth reduction for the null-move search, larger at high depth
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_DEEP_REDUCTION = 3
+NULL_MOVE_MIN_DEPTH = 3
+# Late move reductions: quiet moves from this index on, at this depth or more,
+# are searched one ply shallower first (two plies from LMR_DEEP_INDEX on)
+LMR_MIN_DEPTH = 3
+LMR_MIN_INDEX = 3
+LMR_DEEP_INDEX = 6
+
+def evaluate(position, pawn_table=None):
+    """Static evaluation from the side to move's point of view.
+
+    Adds pawn structure and king shields to Position.evaluate's material;
+    the structure comes from pawn_table when one is given.
+    """
+    if pawn_table is not None:
+        pawns = pawn_table.score(position)
+    else:
+        pawns = evaluate_pawn_structure(position.pieces[PAWN], position.pieces[6 + PAWN])
+    score = position.evaluate() + pawns + evaluate_king_shields(position)
+    return score if position.side == BLACK else -score
+
+class SearchTimeout(Exception):
+    """Raised inside the tree when the time budget runs out"""
+
+# Node count that is never reached, for next_slice when not time-slicing
+NEVER = 1 << 62
+
+class SearchStats:
+    """Work done by one search: node counts, cutoffs, table use, depth and time.
+
+    Searchers leave one in Searcher.stats after every iterative deepening
+    search; counters from helper processes are added in with add().
+    """
+
+    COUNTERS = ('nodes', 'qnodes', 'tt_probes', 'tt_hits', 'pawn_probes', 'pawn_hits')
+
+    def __init__(self, nodes=0, qnodes=0, tt_probes=0, tt_hits=0, pawn_probes=0, pawn_hits=0,
+                 cutoff_histogram=None):
+        self.nodes = nodes
+        self.qnodes = qnodes
+        self.tt_probes = tt_probes
+        self.tt_hits = tt_hits
+        self.pawn_probes = pawn_probes
+        self.pawn_hits = pawn_hits
+        self.cutoff_histogram = list(cutoff_histogram or [0] * CUTOFF_HISTOGRAM_SIZE)
+        self.depth = 0
+        self.elapsed = 0.0
+
+    def add(self, other):
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for index, count in enumerate(other.cutoff_histogram):
+            self.cutoff_histogram[index] += count
+
+    def since(self, earlier):
+        """Counters accumulated since an earlier snapshot"""
+        return SearchStats(*(getattr(self, name) - getattr(earlier, name) for name in self.COUNTERS),
+                           [now - before for now, before in zip(self.cutoff_histogram, earlier.cutoff_histogram)])
+
+    @property
+    def nps(self):
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
+
+    @property
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    @property
+    def pawn_hit_rate(self):
+        return self.pawn_hits / self.pawn_probes if self.pawn_probes else 0.0
+
+    def as_dict(self):
+        return {
+            'depth': self.depth,
+            'elapsed': round(self.elapsed, 4),
+            'nodes': self.nodes,
+            'qnodes': self.qnodes,
+            'nps': self.nps,
+            'cutoff_histogram': self.cutoff_histogram,
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'tt_hit_rate': round(self.tt_hit_rate, 4),
+            'pawn_probes': self.pawn_probes,
+            'pawn_hits': self.pawn_hits,
+            'pawn_hit_rate': round(self.pawn_hit_rate, 4)
+        }
+
+    def __repr__(self):
+        return f"SearchStats({self.as_dict()})"
+
+def run_steps(steps):
+    """Run a search generator to the end without pausing; returns its result"""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as finished:
+            return finished.value
+
+class Searcher:
+    """Alpha-beta search state: the table, the deadline and node counts"""
+
+    # Nodes between clock reads
+    TIME_CHECK_INTERVAL = 256
+
+    def __init__(self, tt, quiescence_checks=False, null_move=True, late_move_reductions=True,
+                 tablebase=None, stats_log=None, pawn_table=None):
+        self.tt = tt
+        self.pawn_table = pawn_table if pawn_table is not None else PawnHashTable()
+        self.tablebase = tablebase          # chess_tablebase.Tablebase for small endings
+        self.tablebase_hits = 0
+        self.quiescence_checks = quiescence_checks
+        self.null_move = null_move
+        self.late_move_reductions = late_move_reductions
+        self.null_cutoffs = 0
+        self.reductions = 0
+        self.reduction_researches = 0
+        self.see_prunes = 0                 # quiescence captures skipped as losing
+        self.nodes = 0
+        self.qnodes = 0
+        self.deadline = None
+        self.stop = None                    # optional Event; setting it aborts the search
+        # Generator searches yield every slice_nodes nodes (0: never)
+        self.slice_nodes = 0
+        self.next_slice = NEVER
+        self.aspiration_researches = 0
+        self.principal_variation = []
+        # Triangular PV table: pv[ply] is the best line found from that ply
+        self.pv = [()] * (MAX_PLY + 1)
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [0] * 4096           # indexed by packed move
+        # Beta cutoffs by the index of the move that caused them
+        self.cutoff_histogram = [0] * CUTOFF_HISTOGRAM_SIZE
+        # Counters reported by worker processes, which have their own tables
+        self.helper_stats = SearchStats()
+        self.stats = None                   # SearchStats of the last search
+        self.stats_log = stats_log          # path to append one JSON line per search to
+
+    def out_of_time(self):
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            return True
+        return self.stop is not None and self.stop.is_set()
+
+    @property
+    def cutoffs(self):
+        return sum(self.cutoff_histogram)
+
+    def first_move_cutoff_rate(self):
+        """Share of beta cutoffs produced by the first move searched"""
+        total = self.cutoffs
+        return self.cutoff_histogram[0] / total if total else 0.0
+
+    def snapshot(self):
+        """Running totals of the counters that go into SearchStats"""
+        stats = SearchStats(self.nodes, self.qnodes, self.tt.probes, self.tt.hits,
+                            self.pawn_table.probes, self.pawn_table.hits, self.cutoff_histogram)
+        stats.add(self.helper_stats)
+        return stats
+
+    def add_helper_stats(self, stats):
+        """Count work done by a worker process in this search"""
+        self.nodes += stats.nodes
+        self.qnodes += stats.qnodes
+        for index, count in enumerate(stats.cutoff_histogram):
+            self.cutoff_histogram[index] += count
+        self.helper_stats.tt_probes += stats.tt_probes
+        self.helper_stats.tt_hits += stats.tt_hits
+        self.helper_stats.pawn_probes += stats.pawn_probes
+        self.helper_stats.pawn_hits += stats.pawn_hits
+
+    def log_stats(self, **fields):
+        """Append the last search's stats, plus any extra fields, to stats_log as a JSON line"""
+        if self.stats_log is None or self.stats is None:
+            return
+        record = {'time': round(time.time(), 3), 'searcher': type(self).__name__}
+        record.update(fields)
+        record.update(self.stats.as_dict())
+        try:
+            with open(self.stats_log, 'a') as log_file:
+                log_file.write(json.dumps(record) + '\n')
+        except OSError as e:
+            print(f"Search stats log error: {e}")
+
+    def order_moves(self, position, moves, tt_move, ply, losing_captures_last=True):
+        """Sort moves best-first for alpha-beta"""
+        squares = position.squares
+        killer_1, killer_2 = self.killers[ply] if ply < MAX_PLY else (None, None)
+        history = self.history
+        scored = []
+        for move in moves:
+            if move == tt_move:
+                score = HASH_MOVE_SCORE
+            else:
+                victim = squares[move >> 6]
+                if victim != EMPTY:
+                    attacker = squares[move & 63]
+                    score = CAPTURE_SCORE + ORDER_VALUES[victim % 6] * 16 - ORDER_VALUES[attacker % 6]
+                    # Only a capture by a more valuable piece can lose material
+                    if losing_captures_last and ORDER_VALUES[attacker % 6] > ORDER_VALUES[victim % 6]:
+                        exchange = position.see(move)
+                        if exchange < 0:
+                            score = exchange  # Below every quiet move
+
+                elif move == killer_1:
+                    score = KILLER_SCORE + 1
+                elif move == killer_2:
+                    score = KILLER_SCORE
+                else:
+                    score = history[move]
+            scored.append((score, move))
+        scored.sort(reverse=True)
+        return [move for _, move in scored]
+
+    def record_cutoff(self, position, move, depth, ply, move_index):
+        self.cutoff_histogram[min(move_index, CUTOFF_HISTOGRAM_SIZE - 1)] += 1
+        if position.squares[move >> 6] != EMPTY:
+            return  # Captures are already ordered by MVV-LVA
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        history = self.history
+        history[move] += depth * depth
+        if history[move] > HISTORY_LIMIT:
+            # Keep history below the killer band
+            for index in range(4096):
+                history[index] >>= 1
+
+    def alphabeta(self, position, depth, alpha, beta, ply):
+        """Principal variation search; returns (score, best move) for the side to move"""
+        return run_steps(self.alphabeta_steps(position, depth, alpha, beta, ply))
+
+    def alphabeta_steps(self, position, depth, alpha, beta, ply):
+        """Generator form of alphabeta: yields every slice_nodes nodes, returns (score, best move)"""
+        self.nodes += 1
+        if not self.nodes % self.TIME_CHECK_INTERVAL and self.out_of_time():
+            raise SearchTimeout()
+        if self.nodes >= self.next_slice:
+            self.next_slice = self.nodes + self.slice_nodes
+            yield
+        pv = self.pv
+        pv[ply] = ()
+
+        tablebase = self.tablebase
+        if tablebase is not None and ply > 0 and popcount(position.occupied) <= tablebase.max_pieces:
+            entry = tablebase.probe(position)
+            if entry is not None:
+                # Exact result: mate distances count from this node
+                self.tablebase_hits += 1
+                result, distance = entry
+                if result == WIN:
+                    return MATE_SCORE - ply - distance, None
+                if result == LOSS:
+                    return -MATE_SCORE + ply + distance, None
+                return 0, None
+
+        if depth <= 0:
+            return self.quiescence(position, alpha, beta, ply, 0), None
+
+        tt = self.tt
+        tt_move = None
+        tt_entry = tt.probe(position.key)
+        if tt_entry is not None:
+            tt_move, tt_depth, tt_bound, tt_score = tt_entry
+            if tt_depth >= depth and ply > 0:
+                tt_score = _score_from_tt(tt_score, ply)
+                if (tt_bound == EXACT or
+                        (tt_bound == LOWER_BOUND and tt_score >= beta) or
+                        (tt_bound == UPPER_BOUND and tt_score <= alpha)):
+                    return tt_score, tt_move
+
+        in_check = position.in_check()
+        null_window = beta - alpha == 1
+        # Null-move pruning: if passing still fails high, a real move will too.
+        # Not in check, not twice in a row, and not with only pawns left, where
+        # zugzwang makes passing better than any legal move.
+        if (self.null_move and null_window and depth >= NULL_MOVE_MIN_DEPTH and ply > 0 and
+                not in_check and abs(beta) < MATE_THRESHOLD and
+                position.history and position.history[-1][0] is not None and
+                position.has_non_pawn_material() and evaluate(position, self.pawn_table) >= beta):
+            reduction = NULL_MOVE_DEEP_REDUCTION if depth > 6 else NULL_MOVE_REDUCTION
+            position.make_null_move()
+            score = -(yield from self.alphabeta_steps(position, depth - 1 - reduction, -beta, -beta + 1, ply + 1))[0]
+            position.unmake_move()
+            if score >= beta:
+                self.null_cutoffs += 1
+                return beta, None
+
+        moves = position.generate_moves()
+        if not moves:
+            # Checkmate or stalemate
+            return (-MATE_SCORE + ply if in_check else 0), None
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        squares = position.squares
+        killers = self.killers[ply] if ply < MAX_PLY else ()
+        reduce_late = self.late_move_reductions and depth >= LMR_MIN_DEPTH and not in_check
+        for index, move in enumerate(self.order_moves(position, moves, tt_move, ply)):
+            quiet = squares[move >> 6] == EMPTY
+            position.make_move(move)
+            if index == 0:
+                score = -(yield from self.alphabeta_steps(position, depth - 1, -beta, -alpha, ply + 1))[0]
+            else:
+                score = None
+                # Late quiet moves are probably bad: try them shallower first
+                if (reduce_late and index >= LMR_MIN_INDEX and quiet and
+                        move not in killers and not position.in_check()):
+                    reduction = 2 if index >= LMR_DEEP_INDEX and depth > LMR_MIN_DEPTH else 1
+                    self.reductions += 1
+                    score = -(yield from self.alphabeta_steps(position, depth - 1 - reduction,
+                                                              -alpha - 1, -alpha, ply + 1))[0]
+                    if score > alpha:
+                        self.reduction_researches += 1
+                        score = None
+                if score is None:
+                    # Null-window check that the move is no better than alpha,
+                    # then a full re-search only if it is
+                    score = -(yield from self.alphabeta_steps(position, depth - 1, -alpha - 1, -alpha, ply + 1))[0]
+                if alpha < score < beta:
+                    score = -(yield from self.alphabeta_steps(position, depth - 1, -beta, -alpha, ply + 1))[0]
+            position.unmake_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    pv[ply] = (move,) + pv[ply + 1]
+                    if alpha >= beta:
+                        self.record_cutoff(position, move, depth, ply, index)
+                        break
+
+        if best_score <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_score >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        tt.store(position.key, depth, bound, _score_to_tt(best_score, ply), best_move)
+        return best_score, best_move
+
+    def quiescence(self, position, alpha, beta, ply, qdepth):
+        """Search captures (and optionally checks) past the horizon until the position is quiet"""
+        self.nodes += 1
+        self.qnodes += 1
+        if not self.nodes % self.TIME_CHECK_INTERVAL and self.out_of_time():
+            raise SearchTimeout()
+        if ply >= MAX_PLY - 1:
+            return evaluate(position, self.pawn_table)
+
+        if self.quiescence_checks and position.in_check():
+            # No standing pat while in check: every evasion has to be tried
+            moves = position.generate_moves()
+            if not moves:
+                return -MATE_SCORE + ply
+            stand_pat = None
+        else:
+            stand_pat = evaluate(position, self.pawn_table)
+            if stand_pat >= beta:
+                return stand_pat
+            # Even winning a queen would not reach alpha
+            if stand_pat + ORDER_VALUES[4] + DELTA_MARGIN < alpha:
+                return stand_pat
+            if stand_pat > alpha:
+                alpha = stand_pat
+            moves = position.generate_captures()
+            if self.quiescence_checks and qdepth == 0:
+                moves += self.quiet_checks(position)
+
+        squares = position.squares
+        best_score = stand_pat if stand_pat is not None else -INFINITY
+        for move in self.order_moves(position, moves, None, MAX_PLY, losing_captures_last=False):
+            victim = squares[move >> 6]
+            if stand_pat is not None and victim != EMPTY:
+                # Delta pruning of captures that cannot raise alpha
+                if stand_pat + ORDER_VALUES[victim % 6] + DELTA_MARGIN <= alpha:
+                    continue
+                # Captures that lose material in the exchange are not searched
+                attacker = squares[move & 63]
+                if ORDER_VALUES[attacker % 6] > ORDER_VALUES[victim % 6] and position.see(move) < 0:
+                    self.see_prunes += 1
+                    continue
+            position.make_move(move)
+            score = -self.quiescence(position, -beta, -alpha, ply + 1, qdepth + 1)
+            position.unmake_move()
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+
+    def quiet_checks(self, position):
+        """Non-capturing legal moves that give check"""
+        checks = []
+        squares = position.squares
+        for move in position.generate_moves():
+            if squares[move >> 6] == EMPTY:
+                position.make_move(move)
+                if position.in_check():
+                    checks.append(move)
+                position.unmake_move()
+        return checks
+
+    def search_depth(self, position, depth, previous_score=None):
+        """One iteration at a fixed depth, inside an aspiration window around previous_score"""
+        return run_steps(self.search_depth_steps(position, depth, previous_score))
+
+    def search_depth_steps(self, position, depth, previous_score=None):
+        if previous_score is None or depth < 3 or abs(previous_score) > MATE_THRESHOLD:
+            return (yield from self.alphabeta_steps(position, depth, -INFINITY, INFINITY, 0))
+
+        delta = ASPIRATION_WINDOW
+        alpha = previous_score - delta
+        beta = previous_score + delta
+        while True:
+            score, move = yield from self.alphabeta_steps(position, depth, alpha, beta, 0)
+            if score <= alpha and alpha > -INFINITY:
+                alpha = max(-INFINITY, alpha - delta)      # Fail low: widen downwards
+            elif score >= beta and beta < INFINITY:
+                beta = min(INFINITY, beta + delta)         # Fail high: widen upwards
+            else:
+                return score, move
+            delta *= 4
+            self.aspiration_researches += 1
+
+    def iterative_deepening(self, position, time_limit, max_depth=64, start_depth=1, age_table=True,
+                            log_stats=True):
+        """Search depth start_depth, start_depth + 1... until time_limit seconds pass.
+
+        Returns (score, best move, depth) from the last iteration that
+        finished. Depth 1 always runs to completion so there is a move.
+        The line behind that score is left in principal_variation, and the
+        work it took in stats (also logged to stats_log if log_stats).
+        """
+        return run_steps(self.iterative_deepening_steps(position, time_limit, max_depth, start_depth, age_table,
+                                                        log_stats=log_stats))
+
+    def iterative_deepening_steps(self, position, time_limit, max_depth=64, start_depth=1, age_table=True,
+                                  slice_nodes=0, log_stats=True):
+        """Generator form of iterative_deepening for hosts without threads (Pyodide).
+
+        Yields about every slice_nodes nodes so the caller can hand control
+        back to the browser between steps; the deadline keeps running while
+        it is paused. Returns (score, best move, depth) like iterative_deepening.
+        """
+        before = self.snapshot()
+        self.slice_nodes = slice_nodes
+        self.next_slice = self.nodes + slice_nodes if slice_nodes else NEVER
+        if age_table:
+            self.tt.new_search()
+        start = time.perf_counter()
+        root_history = len(position.history)
+        best_score, best_move, completed_depth = 0, None, 0
+        previous_score = None
+        for depth in range(start_depth, max_depth + 1):
+            self.deadline = start + time_limit if depth > 1 else None
+            try:
+                score, move = yield from self.search_depth_steps(position, depth, previous_score)
+            except SearchTimeout:
+                # Unwind the moves the aborted iteration left on the board
+                while len(position.history) > root_history:
+                    position.unmake_move()
+                break
+            finally:
+                self.deadline = None
+            best_score, best_move, completed_depth = score, move, depth
+            previous_score = score
+            self.principal_variation = list(self.pv[0])
+            if move is None or abs(score) > MATE_THRESHOLD:
+                break  # No legal moves, or a forced mate was found
+        self.stats = self.snapshot().since(before)
+        self.stats.depth = completed_depth
+        self.stats.elapsed = time.perf_counter() - start
+        if log_stats:
+            self.log_stats()
+        return best_score, best_move, completed_depth
+
+# ---------------------------------------------------------------------------
+# Pondering
+# ---------------------------------------------------------------------------
+
+# Longest a ponder search runs if the opponent takes a long time to move
+PONDER_TIME_LIMIT = 30.0
+
+class Ponderer:
+    """Searches the position after the expected reply while the opponent thinks.
+
+    start() plays our move and the predicted reply on a copy of the root and
+    searches the result on a background thread, filling the shared table.
+    When the opponent has moved, finish() returns the ponder result if they
+    played the predicted move (a ponder hit), and cancel() stops it otherwise.
+    """
+
+    def __init__(self, tt, **options):
+        self.tt = tt
+        self.options = options
+        self.thread = None
+        self.searcher = None
+        self.key = None
+        self.result = None
+        self.started = 0.0
+
+    @property
+    def active(self):
+        return self.thread is not None
+
+    def start(self, position, moves, time_limit=PONDER_TIME_LIMIT):
+        """Ponder the position reached from position by moves (ours, then the predicted reply)"""
+        self.cancel()
+        position = position.copy()
+        for move in moves:
+            position.make_move(move)
+        if not position.has_legal_moves():
+            return
+        self.key = position.key
+        self.result = None
+        self.searcher = Searcher(self.tt, **self.options)
+        self.searcher.stop = threading.Event()
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self._run, args=(position, time_limit), daemon=True)
+        self.thread.start()
+
+    def _run(self, position, time_limit):
+        self.result = self.searcher.iterative_deepening(position, time_limit, log_stats=False)
+        # Tagged so ponder searches, which run on the opponent's time, can be
+        # told apart from the move searches that size the time budget
+        self.searcher.log_stats(ponder=True)
+
+    def _stop(self):
+        self.searcher.stop.set()
+        self.thread.join()
+        self.thread = None
+
+    def cancel(self):
+        """Stop pondering and drop the result"""
+        if self.thread is not None:
+            self._stop()
+        self.key = None
+        self.result = None
+
+    def finish(self, key, time_limit):
+        """On a ponder hit, (score, move, depth) after searching time_limit in total; else None.
+
+        The ponder search has usually run longer than time_limit already,
+        in which case the answer is immediate.
+        """
+        if self.thread is None or key != self.key:
+            self.cancel()
+            return None
+        remaining = time_limit - (time.perf_counter() - self.started)
+        if remaining > 0:
+            self.thread.join(remaining)
+        self._stop()
+        result = self.result
+        self.key = None
+        self.result = None
+        if result is None or result[1] is None:
+            return None
+        return result
+
+
+# ---------------------------------------------------------------------------
+# Root-split parallel search
+# ---------------------------------------------------------------------------
+
+# Per-process state for pool workers, set up by _init_worker
+_worker_searcher = None
+_shared_alpha = None
+
+def parallel_search_available():
+    """True if worker processes can be used on this install"""
+    if multiprocessing is None or sys.platform == 'emscripten':
+        return False
+    if (os.cpu_count() or 1) < 2:
+        return False
+    # Only fork: spawned workers would re-run the pygame front end on import
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+def _init_worker(shared_alpha, tt_size_mb, options):
+    global _worker_searcher, _shared_alpha
+    _shared_alpha = shared_alpha
+    _worker_searcher = Searcher(TranspositionTable(tt_size_mb), **options)
+
+def _search_root_move(position, move, depth, time_limit, new_search):
+    """Worker task: search one root move; returns (move, score, line, SearchStats).
+
+    The score is None if the time limit ran out. Moves that cannot beat the
+    shared alpha only get a null-window search, so their score is an upper bound.
+    """
+    searcher = _worker_searcher
+    if new_search:
+        searcher.tt.new_search()
+    before = searcher.snapshot()
+    searcher.deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    position.make_move(move)
+    try:
+        alpha = _shared_alpha.value
+        if alpha > -INFINITY:
+            score = -searcher.alphabeta(position, depth - 1, -alpha - 1, -alpha, 1)[0]
+        if alpha == -INFINITY or score > alpha:
+            score = -searcher.alphabeta(position, depth - 1, -INFINITY, -alpha, 1)[0]
+    except SearchTimeout:
+        return move, None, (), searcher.snapshot().since(before)
+    finally:
+        searcher.deadline = None
+    with _shared_alpha.get_lock():
+        if score > _shared_alpha.value:
+            _shared_alpha.value = score
+    return move, score, searcher.pv[1], searcher.snapshot().since(before)
+
+class ParallelSearcher(Searcher):
+    """Searcher that splits each iteration's root moves across a process pool.
+
+    The first root move is searched alone to set alpha, then the rest are
+    handed out together; each worker reads the best alpha so far from shared
+    memory when it starts a move and raises it when it finds something
+    better. Node counts and cutoff statistics from all workers are added up
+    here. Without a usable pool everything runs in this process.
+    """
+
+    def __init__(self, tt, workers=None, worker_tt_size_mb=16, **options):
+        super().__init__(tt, **options)
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        self.root_scores = {}
+        self._new_search = False
+        if self.workers > 1 and parallel_search_available():
+            try:
+                context = multiprocessing.get_context('fork')
+                self.shared_alpha = context.Value('i', -INFINITY)
+                self.executor = ProcessPoolExecutor(
+                    self.workers, mp_context=context, initializer=_init_worker,
+                    initargs=(self.shared_alpha, worker_tt_size_mb, options))
+                # Fork the workers now, from the creating thread, rather than
+                # from whichever thread happens to run the first search
+                self.executor.submit(int).result()
+            except (OSError, ImportError, NotImplementedError):
+                # No working semaphores or process support: stay single-process
+                self.executor = None
+
+    @property
+    def parallel(self):
+        return self.executor is not None
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def iterative_deepening(self, position, time_limit, max_depth=64):
+        # One ParallelSearcher lives for the whole game: count per search
+        self.nodes = 0
+        self.cutoff_histogram = [0] * CUTOFF_HISTOGRAM_SIZE
+        self.root_scores = {}
+        self._new_search = True
+        return super().iterative_deepening(position, time_limit, max_depth)
+
+    def search_depth_steps(self, position, depth, previous_score=None):
+        if self.executor is None:
+            return (yield from super().search_depth_steps(position, depth, previous_score))
+
+        moves = position.generate_moves()
+        if not moves:
+            return (-MATE_SCORE if position.in_check() else 0), None
+        # Best move of the last iteration first, the rest by their last scores
+        moves = self.order_moves(position, moves, None, 0)
+        if self.root_scores:
+            moves.sort(key=lambda move: self.root_scores.get(move, -INFINITY), reverse=True)
+
+        time_limit = None
+        if self.deadline is not None:
+            time_limit = self.deadline - time.perf_counter()
+            if time_limit <= 0:
+                raise SearchTimeout()
+        self.shared_alpha.value = -INFINITY
+        root = position.copy()
+        new_search, self._new_search = self._new_search, False
+
+        first = self.executor.submit(_search_root_move, root, moves[0], depth, time_limit, new_search)
+        results = [first.result()]
+        if self.stop is not None and self.stop.is_set():
+            raise SearchTimeout()
+        if results[0][1] is not None:
+            if time_limit is not None:
+                time_limit = self.deadline - time.perf_counter()
+            futures = [self.executor.submit(_search_root_move, root, move, depth, time_limit, new_search)
+                       for move in moves[1:]]
+            results += [future.result() for future in futures]
+
+        best_score, best_move, best_line = -INFINITY, None, ()
+        timed_out = False
+        for move, score, line, stats in results:
+            self.add_helper_stats(stats)
+            if score is None:
+                timed_out = True
+            else:
+                self.root_scores[move] = score
+                if score > best_score:
+                    best_score, best_move, best_line = score, move, line
+        if timed_out:
+            raise SearchTimeout()
+        self.pv[0] = (best_move,) + tuple(best_line)
+        return best_score, best_move
+
+
+# ---------------------------------------------------------------------------
+# Lazy SMP
+# ---------------------------------------------------------------------------
+
+_smp_searcher = None
+
+def _init_smp_worker(table_name, stop, options):
+    global _smp_searcher
+    _smp_searcher = Searcher(SharedTranspositionTable.attach(table_name), **options)
+    _smp_searcher.stop = stop
+
+def _smp_search(position, time_limit, max_depth, start_depth):
+    """Helper task: iterative deepening from start_depth over the shared table.
+
+    Returns (score, move, depth, stats, line) for the deepest iteration finished.
+    """
+    searcher = _smp_searcher
+    score, move, depth = searcher.iterative_deepening(position, time_limit, max_depth, start_depth=start_depth,
+                                                      age_table=False, log_stats=False)
+    return score, move, depth, searcher.stats, searcher.principal_variation
+
+class LazySMPSearcher(Searcher):
+    """Searcher that runs the same search in helper processes over a shared table.
+
+    Helpers start at staggered depths (every other one skips depth 1) so
+    they fill the shared table with different parts of the tree ahead of
+    this process. When the main search finishes the helpers are stopped, and
+    the deepest completed result wins, with this process winning ties.
+    The table lives in shared memory, so memory stays flat as workers are
+    added. Without process support it searches alone over the same table.
+    """
+
+    def __init__(self, tt_size_mb=64, workers=None, **options):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        tt = None
+        if self.workers > 1 and parallel_search_available():
+            try:
+                context = multiprocessing.get_context('fork')
+                tt = SharedTranspositionTable(tt_size_mb)
+                self.stop_helpers = context.Event()
+                self.executor = ProcessPoolExecutor(
+                    self.workers - 1, mp_context=context, initializer=_init_smp_worker,
+                    initargs=(tt.name, self.stop_helpers, options))
+                self.executor.submit(int).result()  # Fork the helpers now, not on the searching thread
+            except (OSError, ImportError, NotImplementedError):
+                if tt is not None:
+                    tt.close()
+                tt = None
+                self.executor = None
+        super().__init__(tt if tt is not None else TranspositionTable(tt_size_mb), **options)
+
+    @property
+    def parallel(self):
+        return self.executor is not None
+
+    def close(self):
+        if self.executor is not None:
+            self.stop_helpers.set()
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+            self.tt.close()
+
+    def iterative_deepening(self, position, time_limit, max_depth=64, start_depth=1, age_table=True,
+                            log_stats=True):
+        self.nodes = 0
+        self.cutoff_histogram = [0] * CUTOFF_HISTOGRAM_SIZE
+        if self.executor is None:
+            return super().iterative_deepening(position, time_limit, max_depth, start_depth, age_table,
+                                               log_stats)
+
+        if age_table:
+            self.tt.new_search()
+        self.stop_helpers.clear()
+        root = position.copy()
+        helpers = [self.executor.submit(_smp_search, root, time_limit, max_depth, 1 + index % 2)
+                   for index in range(1, self.workers)]
+        try:
+            result = super().iterative_deepening(position, time_limit, max_depth, age_table=False,
+                                                 log_stats=False)
+        finally:
+            # Helpers stop at their next time check once the main search is done
+            self.stop_helpers.set()
+        best_score, best_move, best_depth = result
+        for helper in helpers:
+            score, move, depth, stats, line = helper.result()
+            self.nodes += stats.nodes
+            self.stats.add(stats)
+            if move is not None and depth > best_depth:
+                best_score, best_move, best_depth = score, move, depth
+                self.principal_variation = line
+        self.stats.depth = best_depth
+        if log_stats:
+            self.log_stats()
+        return best_score, best_move, best_depth
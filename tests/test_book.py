@@ -0,0 +1,61 @@
+"""Polyglot keys against the published test positions, and a book round trip"""
+import random
+
+import pytest
+
+from chess_book import (OpeningBook, STARTING_BOARD, OPENING_LINES, build_book, write_book, polyglot_key,
+                        _move_from_text)
+from chess_engine import Position
+
+# Positions and keys from the Polyglot book format specification
+@pytest.mark.parametrize('line, key', [
+    ('', 0x463b96181691fc9c),
+    ('e2e4', 0x823c9b50fd114196),
+    ('e2e4 d7d5', 0x0756b94461c50fb0),
+    ('e2e4 d7d5 e4e5', 0x662fafb965db29d4),
+    ('e2e4 d7d5 e4e5 f7f5', 0x22a48b5a8e47ff78),
+    ('e2e4 d7d5 e4e5 f7f5 e1e2', 0x652a607ca3f242c1),
+    ('e2e4 d7d5 e4e5 f7f5 e1e2 e8f7', 0x00fdd303c946bdd9),
+    ('a2a4 b7b5 h2h4 b5b4 c2c4', 0x3c8123ea7b067637),
+])
+def test_polyglot_key(line, key):
+    position = Position.from_board(STARTING_BOARD, 'w')
+    for text in line.split():
+        position.make_move(_move_from_text(text))
+    assert polyglot_key(position) == key
+
+def test_polyglot_key_without_castling_rook():
+    # a2a4 b7b5 h2h4 b5b4 c2c4 b4c3 (en passant) a1a3: only the a1 rook has left home
+    board = [row[:] for row in STARTING_BOARD]
+    for (row, col), piece in {(6, 0): '--', (4, 0): 'wP', (1, 1): '--', (5, 2): 'bP', (6, 7): '--',
+                              (4, 7): 'wP', (6, 2): '--', (7, 0): '--', (5, 0): 'wR'}.items():
+        board[row][col] = piece
+    assert polyglot_key(Position.from_board(board, 'b')) == 0x5c3f9b829b279560
+
+def test_book_round_trip(tmp_path):
+    weights = build_book()
+    path = tmp_path / 'book.bin'
+    write_book(str(path), weights)
+    book = OpeningBook(str(path), rng=random.Random(3))
+    try:
+        # Every line's first position is the start, so all their first moves are there
+        start = Position.from_board(STARTING_BOARD, 'w')
+        first_moves = {}
+        for line in OPENING_LINES:
+            move = _move_from_text(line.split()[0])
+            first_moves[move] = first_moves.get(move, 0) + 1
+        assert dict(book.entries(polyglot_key(start))) == first_moves
+        for _ in range(20):
+            assert book.probe(polyglot_key(start)) in first_moves
+            assert book.choose(start) in first_moves
+        # Follow one line through the book
+        position = Position.from_board(STARTING_BOARD, 'w')
+        for text in OPENING_LINES[0].split():
+            move = _move_from_text(text)
+            assert move in dict(book.entries(polyglot_key(position)))
+            position.make_move(move)
+        position = Position.from_board(STARTING_BOARD, 'w')
+        position.make_move(_move_from_text('a2a3'))
+        assert book.choose(position) is None
+    finally:
+        book.close()
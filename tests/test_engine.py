@@ -0,0 +1,188 @@
+"""Move generation checked against a brute-force list-board reference, SEE and the legal-move cache"""
+import random
+
+import pytest
+
+from chess_engine import (Position, LegalMoveCache, WHITE, BLACK, encode_move, move_to_tuple, square,
+                          tuple_to_move, zobrist_key)
+
+STARTING_BOARD = [
+    ['bR', 'bN', 'bB', 'bQ', 'bK', 'bB', 'bN', 'bR'],
+    ['bP'] * 8,
+    ['--'] * 8,
+    ['--'] * 8,
+    ['--'] * 8,
+    ['--'] * 8,
+    ['wP'] * 8,
+    ['wR', 'wN', 'wB', 'wQ', 'wK', 'wB', 'wN', 'wR']
+]
+
+STEPS = {
+    'N': [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)],
+    'K': [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)],
+}
+RAYS = {
+    'R': [(-1, 0), (1, 0), (0, -1), (0, 1)],
+    'B': [(-1, -1), (-1, 1), (1, -1), (1, 1)],
+}
+RAYS['Q'] = RAYS['R'] + RAYS['B']
+
+def reference_targets(board, row, col):
+    """Squares the piece at (row, col) attacks or moves to, by walking the board"""
+    piece = board[row][col]
+    color, kind = piece
+    targets = []
+    if kind == 'P':
+        step = -1 if color == 'w' else 1
+        if 0 <= row + step < 8:
+            if board[row + step][col] == '--':
+                targets.append((row + step, col))
+                start = 6 if color == 'w' else 1
+                if row == start and board[row + 2 * step][col] == '--':
+                    targets.append((row + 2 * step, col))
+            for side in (-1, 1):
+                if 0 <= col + side < 8 and board[row + step][col + side][0] not in ('-', color):
+                    targets.append((row + step, col + side))
+    elif kind in STEPS:
+        for d_row, d_col in STEPS[kind]:
+            r, c = row + d_row, col + d_col
+            if 0 <= r < 8 and 0 <= c < 8 and board[r][c][0] != color:
+                targets.append((r, c))
+    else:
+        for d_row, d_col in RAYS[kind]:
+            r, c = row + d_row, col + d_col
+            while 0 <= r < 8 and 0 <= c < 8 and board[r][c][0] != color:
+                targets.append((r, c))
+                if board[r][c] != '--':
+                    break
+                r, c = r + d_row, c + d_col
+    return targets
+
+def attacked(board, row, col, by_color):
+    for r in range(8):
+        for c in range(8):
+            piece = board[r][c]
+            if piece[0] != by_color:
+                continue
+            if piece[1] == 'P':
+                step = -1 if by_color == 'w' else 1
+                if r + step == row and abs(c - col) == 1:
+                    return True
+            elif (row, col) in reference_targets(board, r, c):
+                return True
+    return False
+
+def reference_moves(board, color):
+    """Legal moves as (row, col, row, col): try each one and look for attacks on the king"""
+    enemy = 'b' if color == 'w' else 'w'
+    moves = []
+    for row in range(8):
+        for col in range(8):
+            if board[row][col][0] != color:
+                continue
+            for end_row, end_col in reference_targets(board, row, col):
+                after = [line[:] for line in board]
+                after[end_row][end_col] = after[row][col]
+                after[row][col] = '--'
+                king = next((r, c) for r in range(8) for c in range(8) if after[r][c] == color + 'K')
+                if not attacked(after, king[0], king[1], enemy):
+                    moves.append((row, col, end_row, end_col))
+    return moves
+
+def perft(position, depth):
+    if depth == 0:
+        return 1
+    total = 0
+    for move in position.generate_moves():
+        position.make_move(move)
+        total += perft(position, depth - 1)
+        position.unmake_move()
+    return total
+
+def test_perft_from_start():
+    # No castling, en passant or promotion is possible this early, so the
+    # standard chess counts apply
+    position = Position.from_board(STARTING_BOARD, 'w')
+    assert [perft(position, depth) for depth in (1, 2, 3)] == [20, 400, 8902]
+
+def test_generate_moves_matches_reference():
+    rng = random.Random(7)
+    for _ in range(12):
+        position = Position.from_board(STARTING_BOARD, 'w')
+        for _ in range(60):
+            board = position.to_board()
+            moves = position.generate_moves()
+            assert sorted(move_to_tuple(move) for move in moves) == sorted(reference_moves(board, position.turn))
+            if not moves:
+                break
+            position.make_move(rng.choice(moves))
+
+def position_from(pieces):
+    """Position from {'d2': 'wQ', ...}, white to move"""
+    board = [['--'] * 8 for _ in range(8)]
+    for name, piece in pieces.items():
+        board[8 - int(name[1])][ord(name[0]) - ord('a')] = piece
+    return Position.from_board(board)
+
+def algebraic_move(text):
+    from_name, to_name = text[:2], text[2:]
+    return encode_move(square(8 - int(from_name[1]), ord(from_name[0]) - ord('a')),
+                       square(8 - int(to_name[1]), ord(to_name[0]) - ord('a')))
+
+@pytest.mark.parametrize('pieces, move, expected', [
+    # Undefended rook
+    ({'a1': 'wK', 'e1': 'wR', 'e8': 'bK', 'e5': 'bR'}, 'e1e5', 500),
+    # Rook takes a pawn and is recaptured by a pawn
+    ({'a1': 'wK', 'e1': 'wR', 'h8': 'bK', 'e5': 'bP', 'd6': 'bP'}, 'e1e5', -400),
+    # Knight takes a pawn defended by a knight
+    ({'a1': 'wK', 'c3': 'wN', 'h8': 'bK', 'd5': 'bP', 'f6': 'bN'}, 'c3d5', -200),
+    # The rook behind the first one backs up the capture once it has gone
+    ({'a1': 'wK', 'd2': 'wR', 'd1': 'wR', 'h8': 'bK', 'd7': 'bP', 'd8': 'bR'}, 'd2d7', 100),
+    # White stops after Rxd7 rather than giving the rook for the pawn
+    ({'a1': 'wK', 'd2': 'wQ', 'd1': 'wR', 'e8': 'bK', 'd8': 'bR', 'd7': 'bP'}, 'd2d7', -800),
+])
+def test_see(pieces, move, expected):
+    assert position_from(pieces).see(algebraic_move(move)) == expected
+
+def test_legal_move_cache_matches_position():
+    rng = random.Random(11)
+    cache = LegalMoveCache()
+    position = Position.from_board(STARTING_BOARD, 'w')
+    for _ in range(40):
+        board, turn = position.to_board(), position.turn
+        key = zobrist_key(board, turn)
+        for color in (WHITE, BLACK):
+            assert cache.legal_moves(key, board, turn, color) == position.generate_moves(color)
+            assert cache.in_check(key, board, turn, color) == position.in_check(color)
+        assert cache.legal_moves(key, board, turn) == position.generate_moves()
+        moves = position.generate_moves()
+        if not moves:
+            break
+        position.make_move(rng.choice(moves))
+
+def test_legal_move_cache_fills_each_color_on_demand():
+    cache = LegalMoveCache()
+    key = zobrist_key(STARTING_BOARD, 'w')
+    assert len(cache.legal_moves(key, STARTING_BOARD, 'w')) == 20
+    _, moves, checks = cache.entries[key]
+    assert moves[BLACK] is None and checks == [None, None]
+    cache.in_check(key, STARTING_BOARD, 'w', BLACK)
+    assert moves[BLACK] is None and checks[WHITE] is None and checks[BLACK] is False
+    # Asking again is a hit and returns the same list
+    assert cache.legal_moves(key, STARTING_BOARD, 'w') is moves[WHITE]
+    assert (cache.hits, cache.misses) == (2, 1)
+
+def test_legal_move_cache_evicts_least_recently_used():
+    cache = LegalMoveCache(size=2)
+    boards = []
+    position = Position.from_board(STARTING_BOARD, 'w')
+    for move in ((6, 4, 4, 4), (1, 4, 3, 4), (6, 3, 4, 3)):   # e4 e5 d4
+        position.make_move(tuple_to_move(move))
+        boards.append((position.to_board(), position.turn))
+    keys = [zobrist_key(board, turn) for board, turn in boards]
+    cache.legal_moves(keys[0], *boards[0])
+    cache.legal_moves(keys[1], *boards[1])
+    cache.legal_moves(keys[0], *boards[0])      # keys[1] is now the oldest
+    cache.legal_moves(keys[2], *boards[2])
+    assert list(cache.entries) == [keys[0], keys[2]]
+    assert cache.stats()['entries'] == 2
@@ -0,0 +1,74 @@
+"""Headless checks of the pygame front end's game logic"""
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+class _Anything:
+    """Stands in for any pygame object: every attribute and call returns another one"""
+
+    def __getattr__(self, name):
+        return _Anything()
+
+    def __call__(self, *args, **kwargs):
+        return _Anything()
+
+    def __iter__(self):
+        return iter(())
+
+@pytest.fixture(scope='module')
+def game():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    try:
+        import pygame  # noqa: F401
+    except ImportError:
+        stub = types.ModuleType('pygame')
+        stub.__getattr__ = lambda name: _Anything()
+        sys.modules['pygame'] = stub
+    return importlib.import_module('chess')
+
+def test_move_updates_game_state(game):
+    game.reset_game()
+    game.make_move(6, 4, 4, 4)   # e2e4
+    assert game.board[4][4] == 'wP'
+    assert game.turn == 'b'
+    assert not game.game_over
+    assert game.game_state == 'playing'
+
+def test_checkmate_ends_game(game):
+    game.reset_game()
+    for move in ((6, 5, 5, 5), (1, 4, 3, 4), (6, 6, 4, 6), (0, 3, 4, 7)):   # Fool's mate
+        game.make_move(*move)
+    assert game.game_over
+    assert game.game_state == 'black_wins'
+
+def test_import_allocates_no_hard_searcher(game):
+    # The hard AI's table and worker processes wait for its first search
+    assert game.transposition_table is None
+    assert game.parallel_searcher is None
+    assert game.ponderer.tt is None
+
+@pytest.fixture
+def pondering(game, monkeypatch):
+    """Start the ponderer on the reply to 1. e4 e5, over a small table of its own"""
+    from chess_engine import Position, tuple_to_move
+    from chess_search import TranspositionTable
+    game.reset_game()
+    monkeypatch.setattr(game.ponderer, 'tt', TranspositionTable(1))
+    game.ponderer.start(Position.from_board(game.board, game.turn),
+                        [tuple_to_move((6, 4, 4, 4)), tuple_to_move((1, 4, 3, 4))])
+    assert game.ponderer.active
+    yield game.ponderer
+    game.ponderer.cancel()
+
+def test_other_difficulties_stop_pondering(game, pondering):
+    game.get_computer_move('easy')
+    assert not pondering.active
+
+def test_game_end_stops_pondering(game, pondering):
+    for move in ((6, 5, 5, 5), (1, 4, 3, 4), (6, 6, 4, 6), (0, 3, 4, 7)):   # Fool's mate
+        game.make_move(*move)
+    assert game.game_over
+    assert not pondering.active
@@ -0,0 +1,76 @@
+"""Search tables, pondering and the search driver"""
+import json
+import time
+import tracemalloc
+
+import pytest
+
+import chess_search
+from chess_book import STARTING_BOARD
+from chess_engine import Position, tuple_to_move
+from chess_search import SharedTranspositionTable, TranspositionTable, Searcher, Ponderer, EXACT
+
+needs_shared_memory = pytest.mark.skipif(chess_search.multiprocessing is None, reason='no shared memory')
+
+@needs_shared_memory
+@pytest.mark.parametrize('size_mb', [1, 4, 32])
+def test_attached_table_sees_owner_entries(size_mb):
+    owner = SharedTranspositionTable(size_mb)
+    attached = SharedTranspositionTable.attach(owner.name)
+    try:
+        assert attached.bucket_count == owner.bucket_count
+        keys = [(index * 0x9E3779B97F4A7C15) & ((1 << 64) - 1) for index in range(1, 200)]
+        for key in keys:
+            owner.store(key, 4, EXACT, 25, 100)
+        assert all(attached.probe(key) == (100, 4, EXACT, 25) for key in keys)
+        owner.generation = 7
+        assert attached.generation == 7
+    finally:
+        attached.close()
+        owner.close()
+
+def test_ponder_searches_are_tagged_in_stats_log(tmp_path):
+    log = tmp_path / 'stats.jsonl'
+    position = Position.from_board(STARTING_BOARD)
+    Searcher(TranspositionTable(1), stats_log=str(log)).iterative_deepening(position, 0.05, max_depth=2)
+    ponderer = Ponderer(TranspositionTable(1), stats_log=str(log))
+    ponderer.start(position, [tuple_to_move((6, 4, 4, 4)), tuple_to_move((1, 4, 3, 4))])   # e4 e5
+    time.sleep(0.05)
+    ponderer.cancel()
+    search_record, ponder_record = [json.loads(line) for line in log.read_text().splitlines()]
+    assert 'ponder' not in search_record
+    assert ponder_record['ponder'] is True
+
+def test_sliced_search_matches_uninterrupted_search():
+    # The web app steps the search a slice at a time; slicing must not change it
+    results = []
+    for slice_nodes in (0, 7, 500):
+        position = Position.from_board(STARTING_BOARD)
+        searcher = Searcher(TranspositionTable(1))
+        steps = searcher.iterative_deepening_steps(position, 60.0, max_depth=4, slice_nodes=slice_nodes)
+        pauses = 0
+        while True:
+            try:
+                next(steps)
+                pauses += 1
+            except StopIteration as finished:
+                result = finished.value
+                break
+        assert (pauses > 0) == (slice_nodes > 0)
+        assert position.history == []
+        results.append((result, searcher.stats.nodes, searcher.stats.qnodes))
+    assert results[0] == results[1] == results[2]
+    assert results[0][0][2] == 4
+
+def test_table_never_needs_more_than_its_budget():
+    tracemalloc.start()
+    try:
+        table = TranspositionTable(8)
+        table.store(12345, 3, EXACT, 10, 7)
+        table.clear()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert table.size_bytes == 8 * 1024 * 1024
+    assert table.probe(12345) is None
+    assert peak < 1.1 * table.size_bytes
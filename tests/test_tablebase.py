@@ -0,0 +1,101 @@
+"""Shipped tablebases checked against the rules one move at a time, and the probe index"""
+import random
+
+import pytest
+
+from chess_engine import Position, WHITE, BLACK, PAWN, ROOK, KING
+from chess_tablebase import Table, Tablebase, parse_signature, DRAW, WIN, LOSS
+
+SIGNATURES = ['KQvK', 'KRvK', 'KPvK', 'KBvK', 'KNvK']
+POSITIONS_PER_SIGNATURE = 400
+
+@pytest.fixture(scope='module')
+def tablebase():
+    tablebase = Tablebase()
+    missing = [name for name in SIGNATURES if name not in tablebase.available]
+    if missing:
+        pytest.skip(f"tablebases not built: {', '.join(missing)}")
+    return tablebase
+
+def random_position(rng, pieces):
+    """Legal position with these pieces: no pawn on a back rank, side not to move not in check"""
+    while True:
+        squares = rng.sample(range(64), len(pieces))
+        if any(piece % 6 == PAWN and sq >> 3 in (0, 7) for piece, sq in zip(pieces, squares)):
+            continue
+        position = Position()
+        for piece, sq in zip(pieces, squares):
+            position.put_piece(piece, sq)
+        position.side = rng.choice((WHITE, BLACK))
+        if not position.in_check(position.side ^ 1):
+            return position
+
+def mirrored(position):
+    """The same position with the colours swapped and the board turned round"""
+    mirror = Position()
+    for sq, piece in enumerate(position.squares):
+        if piece >= 0:
+            mirror.put_piece((piece + 6) % 12, sq ^ 56)
+    mirror.side = position.side ^ 1
+    return mirror
+
+@pytest.mark.parametrize('name', SIGNATURES)
+@pytest.mark.parametrize('stronger', [WHITE, BLACK])
+def test_results_agree_with_children(tablebase, name, stronger):
+    rng = random.Random(f'{name}{stronger}')
+    pieces = parse_signature(name)
+    if stronger == BLACK:
+        pieces = [(piece + 6) % 12 for piece in pieces]
+    for _ in range(POSITIONS_PER_SIGNATURE // 2):
+        position = random_position(rng, pieces)
+        result, dtm = tablebase.probe(position)
+        assert tablebase.probe(mirrored(position)) == (result, dtm)
+        children = []
+        for move in position.generate_moves():
+            position.make_move(move)
+            children.append(tablebase.probe(position))
+            position.unmake_move()
+        where = f"{name} {position.to_board()} {'wb'[position.side]} to move"
+        if result == WIN:
+            assert (LOSS, dtm - 1) in children, where
+            assert all(child_dtm >= dtm - 1 for child, child_dtm in children if child == LOSS), where
+        elif result == LOSS:
+            assert all(child == WIN for child, _ in children), where
+            if children:
+                assert max(child_dtm for _, child_dtm in children) == dtm - 1, where
+            else:
+                assert dtm == 0 and position.in_check(), where
+        else:
+            assert result == DRAW, where
+            assert all(child != LOSS for child, _ in children), where
+            assert not children or any(child == DRAW for child, _ in children), where
+
+class IndexEcho(Table):
+    """Table whose entries are their own index, to check how the prober builds it"""
+
+    def __init__(self, name):
+        super().__init__(name, 0, 0, b'')
+
+    def entry(self, index):
+        return index
+
+def slots(index, piece_count):
+    return [index >> (6 * slot) & 63 for slot in range(piece_count)], index >> (6 * piece_count)
+
+@pytest.mark.parametrize('stronger', [WHITE, BLACK])
+def test_probe_index_takes_repeated_pieces_in_square_order(stronger):
+    tablebase = Tablebase(directory='')
+    tablebase.add(IndexEcho('KRRvK'))
+    flip = 0 if stronger == WHITE else 56
+    base = stronger * 6
+    position = Position()
+    # Table slots: strong king, rook, rook, weak king
+    position.put_piece(base + KING, 60 ^ flip)
+    position.put_piece(base + ROOK, 7 ^ flip)
+    position.put_piece(base + ROOK, 0 ^ flip)
+    position.put_piece((base + 6) % 12 + KING, 20 ^ flip)
+    position.side = stronger ^ 1
+    squares, side = slots(tablebase.probe(position), 4)
+    # Always from the stronger side's point of view, lower rook square first
+    assert squares == [60, 0, 7, 20]
+    assert side == BLACK
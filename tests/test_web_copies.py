@@ -0,0 +1,11 @@
+"""The web app ships its own copies of the shared modules; they must match the originals"""
+import pathlib
+
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+@pytest.mark.parametrize('module', ['chess_engine.py', 'chess_search.py', 'chess_tablebase.py'])
+def test_web_copy_matches(module):
+    assert (ROOT / 'web-app' / module).read_bytes() == (ROOT / module).read_bytes(), \
+        f'web-app/{module} is stale; copy {module} over it'
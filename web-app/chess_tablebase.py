@@ -0,0 +1,403 @@
+"""
+Endgame tablebases for three- and four-piece endings.
+
+build_table runs retrograde analysis for one material signature such as
+'KRvK' (white pieces, 'v', black pieces) and records, for every position,
+win/draw/loss for the side to move and the distance to mate in plies.
+Captures lead into smaller tables, so those are built first; pawns never
+promote in this game, so pawn moves stay inside the table.
+
+Tables are written as bit-packed files, one per signature:
+
+    python chess_tablebase.py                 # all three-piece tables
+    python chess_tablebase.py --four          # ... and all four-piece ones
+    python chess_tablebase.py KQvKR KRvKP     # selected tables
+
+Independent tables are built in parallel, one per core. Tablebase loads
+the files lazily and probes positions for the search.
+"""
+import os
+import struct
+import sys
+import zlib
+from array import array
+from itertools import combinations_with_replacement
+
+from chess_engine import (Position, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, KING,
+                          PIECE_LETTERS, EMPTY, KNIGHT_ATTACKS, KING_ATTACKS,
+                          rook_attacks, bishop_attacks, popcount)
+
+try:
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    multiprocessing = None
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tablebases')
+FILE_SUFFIX = '.ctb'
+MAGIC = b'CTB1'
+# Header: magic, piece count, bits per entry, entry count
+HEADER = struct.Struct('<4sBBI')
+
+# Results, for the side to move; INVALID marks index values that are not
+# legal positions (two pieces on a square, side not to move in check...)
+DRAW, WIN, LOSS, INVALID = 0, 1, 2, 3
+
+MAX_PIECES = 4
+# Strongest first, the order pieces are listed in signatures
+SIGNATURE_ORDER = 'KQRBNP'
+
+def parse_signature(name):
+    """'KQvKR' -> list of piece indexes, white pieces first"""
+    white, black = name.split('v')
+    return ([WHITE * 6 + PIECE_LETTERS.index(letter) for letter in white] +
+            [BLACK * 6 + PIECE_LETTERS.index(letter) for letter in black])
+
+def _side_strength(letters):
+    return (len(letters), [len(SIGNATURE_ORDER) - SIGNATURE_ORDER.index(letter) for letter in letters])
+
+def canonical_signature(white, black):
+    """Signature for the given piece letters with the stronger side as white; returns (name, flipped)"""
+    white = ''.join(sorted(white, key=SIGNATURE_ORDER.index))
+    black = ''.join(sorted(black, key=SIGNATURE_ORDER.index))
+    if _side_strength(black) > _side_strength(white):
+        return black + 'v' + white, True
+    return white + 'v' + black, False
+
+def position_signature(position):
+    """(name, flipped) for the material on a Position"""
+    letters = ['', '']
+    for piece in range(12):
+        count = popcount(position.pieces[piece])
+        if count:
+            letters[piece // 6] += PIECE_LETTERS[piece % 6] * count
+    return canonical_signature(letters[WHITE], letters[BLACK])
+
+def all_signatures(piece_count):
+    """Every signature with this many pieces, kings included"""
+    names = set()
+    extra = piece_count - 2
+    for pieces in combinations_with_replacement('QRBNP', extra):
+        for split in range(extra + 1):
+            for white in set(combinations_with_replacement(pieces, split)):
+                black = list(pieces)
+                for letter in white:
+                    black.remove(letter)
+                names.add(canonical_signature('K' + ''.join(white), 'K' + ''.join(black))[0])
+    return sorted(names)
+
+def dependencies(name):
+    """Signatures reachable by one capture"""
+    white, black = name.split('v')
+    result = set()
+    for side, letters in ((0, white), (1, black)):
+        for index, letter in enumerate(letters):
+            if letter == 'K':
+                continue
+            rest = letters[:index] + letters[index + 1:]
+            child = canonical_signature(rest, black) if side == 0 else canonical_signature(white, rest)
+            if child[0] != 'KvK':
+                result.add(child[0])
+    return sorted(result)
+
+class Table:
+    """One signature's results, bit-packed as (dtm << 2 | result) entries"""
+
+    def __init__(self, name, bits, count, data):
+        self.name = name
+        self.pieces = parse_signature(name)
+        self.bits = bits
+        self.mask = (1 << bits) - 1
+        self.count = count
+        self.data = data
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as table_file:
+            magic, _, bits, count = HEADER.unpack(table_file.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a tablebase file")
+            data = zlib.decompress(table_file.read())
+        name = os.path.basename(path)[:-len(FILE_SUFFIX)]
+        return cls(name, bits, count, data + b'\0\0\0')
+
+    def save(self, path):
+        with open(path, 'wb') as table_file:
+            table_file.write(HEADER.pack(MAGIC, len(self.pieces), self.bits, self.count))
+            table_file.write(zlib.compress(bytes(self.data[:-3]), 9))
+
+    def entry(self, index):
+        """(result, dtm) at an index"""
+        bit = index * self.bits
+        value = int.from_bytes(self.data[bit >> 3:(bit >> 3) + 3], 'little') >> (bit & 7) & self.mask
+        return value & 3, value >> 2
+
+def pack_entries(results, dtm):
+    """Bit-pack parallel result/dtm arrays at the narrowest width that fits"""
+    width = 2 + max(1, max(dtm).bit_length())
+    packed = bytearray((len(results) * width + 7) // 8 + 3)
+    accumulator = 0
+    filled = 0
+    out = 0
+    for index in range(len(results)):
+        accumulator |= (results[index] | dtm[index] << 2) << filled
+        filled += width
+        while filled >= 8:
+            packed[out] = accumulator & 0xFF
+            accumulator >>= 8
+            filled -= 8
+            out += 1
+    if filled:
+        packed[out] = accumulator
+    return width, packed
+
+class Tablebase:
+    """Lazily loaded tables from a directory, probed by Position"""
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_pieces=MAX_PIECES):
+        self.directory = directory
+        self.tables = {}
+        self.max_pieces = max_pieces
+        self.probes = 0
+        self.hits = 0
+        # Only look for files that exist, so probes of other material are cheap
+        try:
+            self.available = {entry[:-len(FILE_SUFFIX)] for entry in os.listdir(directory)
+                              if entry.endswith(FILE_SUFFIX)}
+        except OSError:
+            self.available = set()
+        if self.available:
+            self.max_pieces = min(max_pieces, max(len(parse_signature(name)) for name in self.available))
+
+    def add(self, table):
+        self.tables[table.name] = table
+        self.available.add(table.name)
+        self.max_pieces = max(self.max_pieces, len(table.pieces))
+
+    def table(self, name):
+        table = self.tables.get(name)
+        if table is None and name in self.available:
+            table = Table.load(os.path.join(self.directory, name + FILE_SUFFIX))
+            self.tables[name] = table
+        return table
+
+    def probe(self, position):
+        """(result, dtm) for the side to move, or None if there is no table"""
+        if popcount(position.occupied) > self.max_pieces:
+            return None
+        self.probes += 1
+        name, flipped = position_signature(position)
+        if name == 'KvK':
+            self.hits += 1
+            return DRAW, 0
+        table = self.table(name)
+        if table is None:
+            return None
+        # Square numbers of each table slot, taking repeated pieces in turn
+        index = 0
+        shift = 0
+        previous = None
+        for piece in table.pieces:
+            if piece != previous:
+                bitboard = position.pieces[(piece + 6) % 12 if flipped else piece]
+                previous = piece
+            low = bitboard & -bitboard
+            bitboard ^= low
+            sq = low.bit_length() - 1
+            index |= (sq ^ 56 if flipped else sq) << shift
+            shift += 6
+        side = position.side ^ 1 if flipped else position.side
+        index |= side << shift
+        self.hits += 1
+        return table.entry(index)
+
+# ---------------------------------------------------------------------------
+# Generation
+# ---------------------------------------------------------------------------
+
+def _predecessors(index, pieces, piece_count):
+    """Indexes of positions one non-capturing move before this one"""
+    side_shift = 6 * piece_count
+    side = index >> side_shift
+    mover = side ^ 1
+    squares = [(index >> (6 * slot)) & 63 for slot in range(piece_count)]
+    occupied = 0
+    for sq in squares:
+        occupied |= 1 << sq
+    base = index ^ (1 << side_shift)        # the mover was on move before
+    result = []
+    for slot, piece in enumerate(pieces):
+        if piece // 6 != mover:
+            continue
+        sq = squares[slot]
+        piece_type = piece % 6
+        if piece_type == PAWN:
+            origins = 0
+            step = 8 if mover == WHITE else -8
+            behind = sq + step
+            if 0 <= behind < 64 and not occupied >> behind & 1:
+                # Pawns never stand on their own back rank
+                if (mover == WHITE and behind < 56) or (mover == BLACK and behind >= 8):
+                    origins |= 1 << behind
+                if (mover == WHITE and sq >> 3 == 4) or (mover == BLACK and sq >> 3 == 3):
+                    start = behind + step
+                    if not occupied >> start & 1:
+                        origins |= 1 << start
+        elif piece_type == KNIGHT:
+            origins = KNIGHT_ATTACKS[sq] & ~occupied
+        elif piece_type == KING:
+            origins = KING_ATTACKS[sq] & ~occupied
+        elif piece_type == BISHOP:
+            origins = bishop_attacks(sq, occupied) & ~occupied
+        elif piece_type == ROOK:
+            origins = rook_attacks(sq, occupied) & ~occupied
+        else:
+            origins = (bishop_attacks(sq, occupied) | rook_attacks(sq, occupied)) & ~occupied
+        shift = 6 * slot
+        cleared = base & ~(63 << shift)
+        while origins:
+            low = origins & -origins
+            origins ^= low
+            result.append(cleared | (low.bit_length() - 1) << shift)
+    return result
+
+def build_table(name, tablebase=None):
+    """Retrograde analysis for one signature; smaller tables come from tablebase"""
+    tablebase = tablebase or Tablebase()
+    pieces = parse_signature(name)
+    piece_count = len(pieces)
+    size = 2 << (6 * piece_count)
+    results = bytearray(size)
+    dtm = array('H', bytes(2 * size))
+    remaining = bytearray(size)            # unresolved non-capturing moves
+    capture_loss = {}                      # longest loss among capture replies
+    draw_capture = set()                   # a capture reaches a drawn ending
+    levels = {}                            # dtm -> indexes decided at that distance
+
+    def push(index, result, distance):
+        results[index] = result
+        dtm[index] = distance
+        levels.setdefault(distance, []).append(index)
+
+    # Pass 1: legality, mates, and everything decided by captures
+    position = Position()
+    placed = []
+    for index in range(size):
+        squares = [(index >> (6 * slot)) & 63 for slot in range(piece_count)]
+        side = index >> (6 * piece_count)
+        if len(set(squares)) < piece_count or any(
+                piece % 6 == PAWN and squares[slot] >> 3 == (7 if piece < 6 else 0)
+                for slot, piece in enumerate(pieces)):
+            results[index] = INVALID
+            continue
+        for sq in placed:
+            position.remove_piece(sq)
+        placed = squares
+        for slot, piece in enumerate(pieces):
+            position.put_piece(piece, squares[slot])
+        position.side = side
+        if position.in_check(side ^ 1):
+            results[index] = INVALID
+            continue
+
+        moves = position.generate_moves()
+        if not moves:
+            if position.in_check():
+                push(index, LOSS, 0)       # Checkmated
+            continue                        # Stalemate stays a draw
+        quiet = 0
+        best_win = None
+        longest_loss = -1
+        drawn = False
+        for move in moves:
+            if position.squares[move >> 6] == EMPTY:
+                quiet += 1
+                continue
+            position.make_move(move)
+            child = tablebase.probe(position)
+            position.unmake_move()
+            child_result, child_dtm = child
+            if child_result == LOSS:
+                if best_win is None or child_dtm < best_win:
+                    best_win = child_dtm
+            elif child_result == WIN:
+                longest_loss = max(longest_loss, child_dtm)
+            else:
+                drawn = True
+        remaining[index] = quiet
+        if best_win is not None:
+            push(index, WIN, best_win + 1)
+            continue
+        if drawn:
+            draw_capture.add(index)
+        elif longest_loss >= 0:
+            capture_loss[index] = longest_loss
+        if not quiet and not drawn:
+            push(index, LOSS, longest_loss + 1)   # Every capture loses
+
+    # Pass 2: walk back from decided positions in order of distance
+    distance = 0
+    while levels:
+        current = levels.pop(distance, ())
+        for index in current:
+            if dtm[index] != distance:
+                continue  # Improved to a shorter win since it was queued
+            if results[index] == LOSS:
+                for previous in _predecessors(index, pieces, piece_count):
+                    result = results[previous]
+                    if result == INVALID or result == LOSS or (result == WIN and dtm[previous] <= distance + 1):
+                        continue
+                    push(previous, WIN, distance + 1)
+            else:
+                for previous in _predecessors(index, pieces, piece_count):
+                    if results[previous] != DRAW:
+                        continue
+                    remaining[previous] -= 1
+                    if not remaining[previous] and previous not in draw_capture:
+                        push(previous, LOSS, max(distance, capture_loss.get(previous, -1)) + 1)
+        distance += 1
+
+    bits, packed = pack_entries(results, dtm)
+    return Table(name, bits, size, bytes(packed))
+
+def _build_and_save(name, directory):
+    table = build_table(name, Tablebase(directory))
+    table.save(os.path.join(directory, name + FILE_SUFFIX))
+    wins = sum(1 for index in range(table.count) if table.entry(index)[0] == WIN)
+    return name, wins
+
+def build_tables(names, directory=DEFAULT_DIRECTORY, workers=None):
+    """Build the named tables, and any missing smaller ones they depend on, in parallel"""
+    os.makedirs(directory, exist_ok=True)
+    needed = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(dependency for dependency in dependencies(name)
+                           if not os.path.exists(os.path.join(directory, dependency + FILE_SUFFIX)))
+    workers = workers or os.cpu_count() or 1
+    # Tables with the same piece count never depend on each other
+    for piece_count in range(3, MAX_PIECES + 1):
+        batch = sorted(name for name in needed if len(parse_signature(name)) == piece_count)
+        if not batch:
+            continue
+        if workers > 1 and multiprocessing is not None and len(batch) > 1:
+            with ProcessPoolExecutor(min(workers, len(batch))) as executor:
+                done = executor.map(_build_and_save, batch, [directory] * len(batch))
+                for name, wins in done:
+                    print(f"{name}: {wins} wins")
+        else:
+            for name in batch:
+                name, wins = _build_and_save(name, directory)
+                print(f"{name}: {wins} wins")
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    requested = [argument for argument in arguments if not argument.startswith('--')]
+    if not requested:
+        requested = all_signatures(3)
+        if '--four' in arguments:
+            requested += all_signatures(4)
+    build_tables(requested)
@@ -2,6 +2,8 @@ import sys
 import random
 import json
 from js import document, window, console
+from chess_engine import zobrist_key, update_zobrist_key, Position, move_to_tuple, evaluate_moves
+from chess_search import TranspositionTable, PawnHashTable, Searcher
 
 # Web environment detection
 is_web = True
@@ -27,17 +29,12 @@ board = [
 # Game state
 selected_square = None
 turn = 'w'
+board_key = zobrist_key(board, turn)
 game_over = False
 winner = None
 difficulty = 'medium'
 game_mode = 'selecting_difficulty'
 
-# Piece values for AI
-piece_values = {
-    'P': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 0,
-    'p': 1, 'n': 3, 'b': 3, 'r': 5, 'q': 9, 'k': 0
-}
-
 def init_web_game():
     """Initialize the game for web environment"""
     try:
@@ -54,6 +51,8 @@ def get_board_state():
     return json.dumps({
         'board': board,
         'turn': turn,
+        # Hex string: JavaScript numbers cannot hold a 64-bit key
+        'key': format(board_key, '016x'),
         'game_over': game_over,
         'winner': winner,
         'selected_square': selected_square,
@@ -63,7 +62,7 @@ def get_board_state():
 
 def make_move_python(start_row, start_col, end_row, end_col):
     """Make a move on the board"""
-    global turn, game_over, winner
+    global turn, board_key, game_over, winner
 
     try:
         if not is_valid_move(start_row, start_col, end_row, end_col):
@@ -71,6 +70,8 @@ def make_move_python(start_row, start_col, end_row, end_col):
 
         # Make the move
         piece = board[start_row][start_col]
+        board_key = update_zobrist_key(board_key, piece, board[end_row][end_col],
+                                       start_row, start_col, end_row, end_col)
         board[end_row][end_col] = piece
         board[start_row][start_col] = '--'
 
@@ -84,6 +85,7 @@ def make_move_python(start_row, start_col, end_row, end_col):
             'success': True,
             'board': board,
             'turn': turn,
+            'key': format(board_key, '016x'),
             'game_over': game_over,
             'winner': winner
         })
@@ -154,7 +156,7 @@ def get_ai_move():
 
 def reset_game():
     """Reset the game to initial state"""
-    global board, selected_square, turn, game_over, winner, game_mode
+    global board, board_key, selected_square, turn, game_over, winner, game_mode
 
     board = [
         ['bR', 'bN', 'bB', 'bQ', 'bK', 'bB', 'bN', 'bR'],
@@ -169,6 +171,7 @@ def reset_game():
 
     selected_square = None
     turn = 'w'
+    board_key = zobrist_key(board, turn)
     game_over = False
     winner = None
     game_mode = 'playing'
@@ -233,15 +236,10 @@ winner = None
 difficulty = 'medium'  # Default difficulty
 game_mode = 'selecting_difficulty'  # 'selecting_difficulty' or 'playing'
 
-# Piece values for AI
-piece_values = {
-    'P': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 0,
-    'p': 1, 'n': 3, 'b': 3, 'r': 5, 'q': 9, 'k': 0
-}
-
 # Game state
 selected_square = None
 turn = 'w'
+board_key = zobrist_key(board, turn)
 game_over = False
 winner = None
 game_state = 'playing'
@@ -476,7 +474,7 @@ def get_square_from_pos(pos):
     return row, col
 
 # Include all the game logic functions from the original chess.py
-# (is_valid_move, make_move, get_random_move, evaluate_board, minimax, etc.)
+# (is_valid_move, make_move, get_random_move, etc.)
 
 def is_valid_move(start_row, start_col, end_row, end_col):
     """Validate chess moves"""
@@ -598,7 +596,9 @@ def is_valid_move(start_row, start_col, end_row, end_col):
 
 def make_move(start_row, start_col, end_row, end_col):
     """Execute a move"""
-    global turn
+    global turn, board_key
+    board_key = update_zobrist_key(board_key, board[start_row][start_col], board[end_row][end_col],
+                                   start_row, start_col, end_row, end_col)
     board[end_row][end_col] = board[start_row][start_col]
     board[start_row][start_col] = '--'
     turn = 'b' if turn == 'w' else 'w'
@@ -618,99 +618,64 @@ def get_random_move():
         return random.choice(moves)
     return None
 
-def evaluate_board(board):
-    """Simple board evaluation for AI"""
-    score = 0
-    for row in range(8):
-        for col in range(8):
-            piece = board[row][col]
-            if piece != '--':
-                value = piece_values.get(piece[1], 0)
-                center_bonus = 0
-                if 2 <= row <= 5 and 2 <= col <= 5:
-                    center_bonus = 0.1 * value
-                multiplier = 1 if piece[0] == 'b' else -1
-                score += multiplier * (value + center_bonus)
-    return score
-
-def minimax(board, depth, alpha, beta, maximizing_player):
-    """Minimax algorithm with alpha-beta pruning"""
-    if depth == 0 or game_over:
-        return evaluate_board(board), None
-
-    if maximizing_player:
-        max_eval = float('-inf')
-        best_move = None
-        moves = get_all_moves(board, 'b')
-        for move in moves:
-            temp_board = [row[:] for row in board]
-            temp_board[move[2]][move[3]] = temp_board[move[0]][move[1]]
-            temp_board[move[0]][move[1]] = '--'
-            eval_score, _ = minimax(temp_board, depth - 1, alpha, beta, False)
-            if eval_score > max_eval:
-                max_eval = eval_score
-                best_move = move
-            alpha = max(alpha, eval_score)
-            if beta <= alpha:
-                break
-        return max_eval, best_move
-    else:
-        min_eval = float('inf')
-        best_move = None
-        moves = get_all_moves(board, 'w')
-        for move in moves:
-            temp_board = [row[:] for row in board]
-            temp_board[move[2]][move[3]] = temp_board[move[0]][move[1]]
-            temp_board[move[0]][move[1]] = '--'
-            eval_score, _ = minimax(temp_board, depth - 1, alpha, beta, True)
-            if eval_score < min_eval:
-                min_eval = eval_score
-                best_move = move
-            beta = min(beta, eval_score)
-            if beta <= alpha:
-                break
-        return min_eval, best_move
-
-def get_all_moves(board, color):
-    """Get all valid moves for a color"""
-    moves = []
-    for row in range(8):
-        for col in range(8):
-            if board[row][col][0] == color:
-                for end_row in range(8):
-                    for end_col in range(8):
-                        if is_valid_move(row, col, end_row, end_col):
-                            moves.append((row, col, end_row, end_col))
-    return moves
-
 def get_computer_move(difficulty):
-    """Get computer move based on difficulty"""
+    """Get computer move based on difficulty; the hard AI runs through start_ai_search instead"""
     if difficulty == 'easy':
         return get_random_move()
     elif difficulty == 'medium':
-        moves = get_all_moves(board, turn)
+        # Score all children in one batch (vectorized when NumPy loaded)
+        position = Position.from_board(board, turn)
+        moves = position.generate_moves()
         if not moves:
             return None
 
-        best_move = None
-        best_score = float('-inf')
-
-        for move in moves:
-            temp_board = [row[:] for row in board]
-            temp_board[move[2]][move[3]] = temp_board[move[0]][move[1]]
-            temp_board[move[0]][move[1]] = '--'
-            score = evaluate_board(temp_board)
-            if score > best_score:
-                best_score = score
-                best_move = move
-
-        return best_move if best_move else random.choice(moves)
-    elif difficulty == 'hard':
-        _, best_move = minimax(board, 2, float('-inf'), float('inf'), True)
-        return best_move
+        scores = evaluate_moves(position, moves)
+        return move_to_tuple(moves[scores.index(max(scores))])
     else:
         return get_random_move()
 
+# Pyodide has no threads, so the hard AI runs as a generator search that
+# JavaScript steps once per animation frame via step_ai_search
+AI_TIME_LIMIT = 1.0
+AI_SLICE_NODES = 500
+transposition_table = TranspositionTable(16)
+pawn_table = PawnHashTable()
+ai_search = None
+
+def start_ai_search():
+    """Begin the hard AI's search for the side to move"""
+    global ai_search
+    position = Position.from_board(board, turn)
+    searcher = Searcher(transposition_table, pawn_table=pawn_table)
+    ai_search = searcher.iterative_deepening_steps(position, AI_TIME_LIMIT, slice_nodes=AI_SLICE_NODES)
+
+def ai_thinking():
+    return ai_search is not None
+
+def step_ai_search():
+    """Run one slice of the AI search, playing its move when it finishes"""
+    global ai_search
+    if ai_search is None:
+        return json.dumps({'thinking': False})
+    try:
+        next(ai_search)
+        return json.dumps({'thinking': True})
+    except StopIteration as finished:
+        ai_search = None
+        _, best_move, depth = finished.value
+    if best_move is not None and not game_over:
+        move = move_to_tuple(best_move)
+        make_move(*move)
+        if console:
+            console.log(f"Computer searched to depth {depth} and moved from ({move[0]}, {move[1]}) to ({move[2]}, {move[3]})")
+    return json.dumps({'thinking': False})
+
+def cancel_ai_search():
+    global ai_search
+    if ai_search is not None:
+        ai_search.close()
+        ai_search = None
+
 def is_king_in_check(board, king_color):
     """Check if king is in check"""
     king_pos = None
@@ -872,8 +837,9 @@ def check_game_state():
 
 def reset_game():
     """Reset game to initial state"""
-    global board, selected_square, turn, game_over, winner, game_state, game_mode
+    global board, board_key, selected_square, turn, game_over, winner, game_state, game_mode
 
+    cancel_ai_search()
     board = [
         ['bR', 'bN', 'bB', 'bQ', 'bK', 'bB', 'bN', 'bR'],
         ['bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP'],
@@ -887,6 +853,7 @@ def reset_game():
 
     selected_square = None
     turn = 'w'
+    board_key = zobrist_key(board, turn)
     game_over = False
     winner = None
     game_state = 'playing'
@@ -973,7 +940,7 @@ def handle_mouse_click(x, y):
         reset_game()
         return
 
-    if game_mode == 'selecting_difficulty':
+    if game_mode == 'selecting_difficulty' or ai_search is not None:
         return
 
     row, col = get_square_from_pos((x, y))
@@ -994,10 +961,13 @@ def handle_mouse_click(x, y):
 
                 # Computer's turn
                 if not game_over:
-                    move = get_computer_move(difficulty)
-                    if move:
-                        make_move(*move)
-                        console.log(f"Computer moved from ({move[0]}, {move[1]}) to ({move[2]}, {move[3]})")
+                    if difficulty == 'hard':
+                        start_ai_search()  # Stepped from JavaScript
+                    else:
+                        move = get_computer_move(difficulty)
+                        if move:
+                            make_move(*move)
+                            console.log(f"Computer moved from ({move[0]}, {move[1]}) to ({move[2]}, {move[3]})")
             else:
                 selected_square = None
                 console.log(f"Invalid move from ({start_row}, {start_col}) to ({row}, {col})")
@@ -4,6 +4,9 @@ const urlsToCache = [
   '/',
   '/index.html',
   '/chess_web.py',
+  '/chess_engine.py',
+  '/chess_search.py',
+  '/chess_tablebase.py',
   '/manifest.json',
   '/wP.png',
   '/wR.png',